@@ -0,0 +1,192 @@
+import socket
+import struct
+import threading
+import time
+from pathlib import Path
+
+# offsets of tcpi_unacked and tcpi_sacked in `struct tcp_info`. For a listening
+# socket they hold the current accept queue length and the backlog
+TCP_INFO_QUEUE = struct.Struct("<II")
+TCP_INFO_QUEUE_OFFSET = 24
+
+
+def read_listen_overflows() -> int:
+    """Reads the host-wide number of connections dropped by full accept queues
+
+    Returns:
+        (int/None): the `ListenOverflows` counter of /proc/net/netstat, or None
+        if it is not available on this platform
+    """
+    try:
+        lines: list[str] = Path("/proc/net/netstat").read_text().splitlines()
+    except OSError:
+        return None
+    for header, values in zip(lines[::2], lines[1::2]):
+        if header.startswith("TcpExt:"):
+            counters = dict(zip(header.split()[1:], values.split()[1:]))
+            if "ListenOverflows" in counters:
+                return int(counters["ListenOverflows"])
+    return None
+
+
+def get_accept_queue_length(listen_socket: socket.socket) -> int:
+    """Returns the number of connections waiting in the accept queue of a
+    listening socket, or None if the platform does not report it"""
+    if not hasattr(socket, "TCP_INFO"):
+        return None
+    try:
+        info: bytes = listen_socket.getsockopt(socket.IPPROTO_TCP, socket.TCP_INFO, 104)
+    except OSError:
+        return None
+    if len(info) < TCP_INFO_QUEUE_OFFSET + TCP_INFO_QUEUE.size:
+        return None
+    return TCP_INFO_QUEUE.unpack_from(info, TCP_INFO_QUEUE_OFFSET)[0]
+
+
+class AcceptorGroup:
+    """A group of acceptor threads that accept connections on the same address
+
+    If more than one acceptor is requested and the platform supports
+    `SO_REUSEPORT`, every acceptor binds its own listening socket and the
+    kernel spreads incoming connections among them. Otherwise the acceptors
+    share a single listening socket.
+
+    `SO_REUSEPORT` would also let another process listen to the same port and
+    take a share of the connections, so the group first checks that nothing
+    listens to its address. With port 0, the first socket binds a free port
+    and the rest join it. `address` is then updated to the bound address.
+
+    Attributes:
+        address (tuple[str, int]): the address the acceptors listen to
+        handle_connection (function): called with (socket, address) for every
+        accepted connection
+        keep_running (function): the acceptors stop once it returns False
+        num_acceptors (int): the number of acceptor threads
+        backlog (int): the accept queue length of every listening socket
+        reuse_port (bool): whether every acceptor has its own socket
+        listening (Event): set once every socket is listening
+        accepted (list[int]): the number of connections each acceptor accepted
+        peak_queue_length (int): the longest accept queue that was observed
+    """
+    def __init__(
+            self,
+            address: tuple[str, int],
+            handle_connection: "function",
+            keep_running: "function",
+            num_acceptors: int = 1,
+            backlog: int = 5
+            ):
+        self.address: tuple[str, int] = address
+        self.handle_connection = handle_connection
+        self.keep_running = keep_running
+        self.num_acceptors: int = num_acceptors
+        self.backlog: int = backlog
+        self.reuse_port: bool = num_acceptors > 1 and hasattr(socket, "SO_REUSEPORT")
+        self.listening: threading.Event = threading.Event()
+        self.accepted: list[int] = [0] * num_acceptors
+        self.peak_queue_length: int = 0
+        self.threads: list[threading.Thread] = []
+        self.sockets: list[socket.socket] = []
+        self.start_time: float = None
+        self.stop_time: float = None
+        self.start_overflows: int = None
+        self.stop_overflows: int = None
+
+    def create_socket(self) -> socket.socket:
+        """Creates a listening socket bound to the group's address"""
+        listen_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listen_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.reuse_port:
+            listen_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        listen_socket.bind(self.address)
+        listen_socket.listen(self.backlog)
+        listen_socket.settimeout(2)
+        return listen_socket
+
+    def check_address(self):
+        """Checks that no other socket listens to the group's address
+
+        The check binds the address without `SO_REUSEPORT`, so it fails like a
+        plain bind would if another server already listens to it
+
+        Raises:
+            OSError: EADDRINUSE if the address is taken
+        """
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe_socket:
+            probe_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            probe_socket.bind(self.address)
+
+    def start(self):
+        """Binds the listening sockets and starts the acceptor threads
+
+        Raises:
+            OSError: if the address is taken
+        """
+        self.start_overflows = read_listen_overflows()
+        self.start_time = time.perf_counter()
+        if self.reuse_port:
+            if self.address[1]:
+                self.check_address()
+            self.sockets = [self.create_socket()]
+            self.address = self.sockets[0].getsockname()
+            self.sockets += [self.create_socket() for _ in range(self.num_acceptors - 1)]
+        else:
+            self.sockets = [self.create_socket()]
+            self.address = self.sockets[0].getsockname()
+        for i in range(self.num_acceptors):
+            listen_socket: socket.socket = self.sockets[i % len(self.sockets)]
+            thread = threading.Thread(target=self.accept, args=(i, listen_socket, ))
+            thread.start()
+            self.threads.append(thread)
+        self.listening.set()
+
+    def accept(self, acceptor: int, listen_socket: socket.socket):
+        """Implements the accept loop of a single acceptor"""
+        while self.keep_running():
+            try:
+                client_socket, client_address = listen_socket.accept()
+                self.accepted[acceptor] += 1
+                queue_length = get_accept_queue_length(listen_socket)
+                if queue_length and queue_length > self.peak_queue_length:
+                    self.peak_queue_length = queue_length
+                self.handle_connection(client_socket, client_address)
+            except socket.timeout:
+                pass
+
+    def join(self):
+        """Waits for every acceptor thread to terminate and closes the sockets"""
+        for thread in self.threads:
+            thread.join()
+        for listen_socket in self.sockets:
+            listen_socket.close()
+        self.stop_time = time.perf_counter()
+        self.stop_overflows = read_listen_overflows()
+
+    def get_stats(self) -> dict:
+        """Returns the accept counters of the group
+
+        Returns:
+            (dict): the number of accepted connections, the accept rate in
+            connections per second, the longest accept queue observed and the
+            accept queue overflows during the group's lifetime. The overflows
+            are the change of the host-wide ListenOverflows counter, so they
+            include the drops of every other listening socket on the host, not
+            only of this server's. They are None if the platform does not
+            report them
+        """
+        end_time: float = self.stop_time or time.perf_counter()
+        elapsed: float = end_time - self.start_time if self.start_time else 0
+        accepted: int = sum(self.accepted)
+        end_overflows: int = self.stop_overflows if self.stop_time else read_listen_overflows()
+        overflows: int = None
+        if self.start_overflows is not None and end_overflows is not None:
+            overflows = end_overflows - self.start_overflows
+        return {
+            "acceptors": self.num_acceptors,
+            "reuse_port": self.reuse_port,
+            "backlog": self.backlog,
+            "accepted": accepted,
+            "accept_rate": accepted / elapsed if elapsed else 0.0,
+            "peak_queue_length": self.peak_queue_length,
+            "host_listen_overflows": overflows,
+        }
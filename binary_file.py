@@ -0,0 +1,95 @@
+import mmap
+import struct
+import sys
+from pathlib import Path
+
+
+def align(offset: int) -> int:
+    """Rounds an offset up to the next multiple of 8 bytes"""
+    return (offset + 7) & ~7
+
+
+def encode_names(names: list[str]) -> bytes:
+    """Packs the peers' names into a blob, one per line"""
+    return "\n".join(names).encode()
+
+
+def decode_names(blob: bytes) -> list[str]:
+    """Unpacks a blob created by `encode_names`"""
+    return blob.decode().split("\n") if blob else []
+
+
+def write_preamble(file: "BufferedWriter", header: struct.Struct, *fields, names_blob: bytes = b""):
+    """Writes a header followed by a names blob, padded to a multiple of 8 bytes
+
+    Args:
+        file (BufferedWriter): the file, at offset 0
+        header (Struct): the header, whose first fields are the magic and the version
+        fields: the values of the header
+        names_blob (bytes): the names, see `encode_names`
+    """
+    preamble: bytes = header.pack(*fields) + names_blob
+    file.write(preamble.ljust(align(len(preamble)), b"\0"))
+
+
+class MappedFile:
+    """A read-only memory map of a binary file of the simulation
+
+    The files start with a header whose first fields are a magic string and
+    a version. Their integer data is little-endian and 8-byte aligned, so it
+    can be cast in place. Every view handed out by `_section` is tracked and
+    released by `close`, after which it can no longer be read.
+
+    Attributes:
+        path (Path): the mapped file
+        kind (str): the kind of the file, e.g. "trace", for error messages
+    """
+    def __init__(self, path: str | Path, kind: str):
+        if sys.byteorder != "little":
+            raise OSError(f"{kind.capitalize()} files can only be mapped on little-endian hosts")
+        self.path: Path = Path(path)
+        self.kind: str = kind
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view: memoryview = memoryview(self._mm)
+        self._views: list[memoryview] = []
+
+    def _read_header(self, header: struct.Struct, magic: bytes, version: int) -> tuple:
+        """Checks the magic and the version of the file
+
+        Returns:
+            (tuple): the rest of the fields of the header
+
+        Raises:
+            ValueError: if the file is not of the given kind and version
+        """
+        file_magic, file_version, *fields = header.unpack_from(self._mm, 0)
+        if file_magic != magic or file_version != version:
+            self.close()
+            raise ValueError(f"{self.path} is not a version {version} {self.kind}")
+        return tuple(fields)
+
+    def _section(self, offset: int, length: int, format: str) -> memoryview:
+        """Returns a typed memoryview over a section of the file"""
+        view: memoryview = self._view[offset:offset + length].cast(format)
+        self._views.append(view)
+        return view
+
+    def _read_names(self, offset: int, length: int) -> list[str]:
+        """Decodes the names blob at a section of the file"""
+        return decode_names(self._mm[offset:offset + length])
+
+    def close(self):
+        """Releases the views and unmaps the file"""
+        for view in self._views:
+            view.release()
+        self._views.clear()
+        self._view.release()
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self) -> "MappedFile":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,210 @@
+import mmap
+import random
+import socket
+import struct
+from array import array
+from pathlib import Path
+from binary_file import MappedFile, align, encode_names
+
+MAGIC = b"IPPSCKPT"
+VERSION = 1
+# magic, version, round, size, num_peers, names_bytes, rng_version, rng_has_gauss, rng_gauss
+HEADER = struct.Struct("<8sIiiiIiid")
+RNG_STATE_LEN = 625
+DIRECTION_CODES = {"up": 0, "down": 1, "left": 2, "right": 3}
+CODE_DIRECTIONS = ["up", "down", "left", "right"]
+
+
+def _layout(size: int, num_peers: int, names_bytes: int) -> dict[str, tuple[int, int]]:
+    """Computes the (offset, length in bytes) of every section of a checkpoint
+
+    Every integer section is 8-byte aligned so that it can be cast in place
+    """
+    sections: list[tuple[str, int]] = [
+        ("rng_state", RNG_STATE_LEN * 4),
+        ("positions", num_peers * 2 * 4),
+        ("next_positions", num_peers * 2 * 4),
+        ("move_states", num_peers * 4),
+        ("hosts", num_peers * 4),
+        ("ports", num_peers * 4),
+        ("grid", size * size * 4),
+        ("names", names_bytes),
+    ]
+    layout: dict[str, tuple[int, int]] = {}
+    offset: int = align(HEADER.size)
+    for section, length in sections:
+        layout[section] = (offset, length)
+        offset = align(offset + length)
+    layout["total"] = (offset, 0)
+    return layout
+
+
+def encode_move_state(next_pos: tuple[int, int], random_directions: list[str]) -> int:
+    """Packs a peer's pending move into a single integer
+
+    bit 0 flags a pending next_pos, bits 1-3 hold the number of remaining
+    directions and every following pair of bits holds one direction, in order
+    """
+    state: int = 1 if next_pos else 0
+    state |= len(random_directions) << 1
+    for i, direction in enumerate(random_directions):
+        state |= DIRECTION_CODES[direction] << (4 + 2 * i)
+    return state
+
+
+def decode_move_state(state: int) -> tuple[bool, list[str]]:
+    """Unpacks an integer created by `encode_move_state`
+
+    Returns:
+        (tuple[bool, list[str]]): whether next_pos was pending and the
+        remaining random directions
+    """
+    has_next_pos: bool = bool(state & 1)
+    count: int = (state >> 1) & 0b111
+    random_directions: list[str] = [CODE_DIRECTIONS[(state >> (4 + 2 * i)) & 0b11] for i in range(count)]
+    return has_next_pos, random_directions
+
+
+def write_checkpoint(path: str | Path, server: "Server", peers: list["Peer"]):
+    """Writes the state of the simulation into a memory-mapped binary file
+
+    Peers are stored in the order of the `peers` list, which is the order
+    they were bootstrapped in, so the index of a peer is its id. The occupancy
+    grid is a copy of the server's area: the id of the peer in each cell, or
+    EMPTY (-1) if the cell is empty.
+
+    Args:
+        path (str | Path): the checkpoint file
+        server (Server): the simulation's server
+        peers (list[Peer]): the simulation's peers
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    names: list[str] = [peer.get_name() for peer in peers]
+    names_blob: bytes = encode_names(names)
+    num_peers: int = len(peers)
+    size: int = server.SIZE
+    layout = _layout(size, num_peers, len(names_blob))
+
+    positions = array("i", bytes(num_peers * 2 * 4))
+    next_positions = array("i", bytes(num_peers * 2 * 4))
+    move_states = array("i", bytes(num_peers * 4))
+    hosts = array("I", bytes(num_peers * 4))
+    ports = array("i", bytes(num_peers * 4))
+    for i, peer in enumerate(peers):
+        x, y = peer.get_pos()
+        positions[2 * i] = x
+        positions[2 * i + 1] = y
+        next_pos, random_directions = peer.get_move_state()
+        if next_pos:
+            next_positions[2 * i] = next_pos[0]
+            next_positions[2 * i + 1] = next_pos[1]
+        move_states[i] = encode_move_state(next_pos, random_directions)
+        host, port = peer.get_source_address()
+        hosts[i] = struct.unpack("!I", socket.inet_aton(host))[0]
+        ports[i] = port
+
+    with server.lock:
+        grid = array("i", server.area.grid)
+
+    rng_version, rng_internal, rng_gauss = random.getstate()
+    rng_state = array("I", rng_internal)
+
+    with open(path, "w+b") as file:
+        file.truncate(layout["total"][0])
+        with mmap.mmap(file.fileno(), 0) as mm:
+            HEADER.pack_into(
+                mm, 0,
+                MAGIC, VERSION, server.round, size, num_peers, len(names_blob),
+                rng_version, rng_gauss is not None, rng_gauss or 0.0
+            )
+            for section, data in [
+                ("rng_state", rng_state.tobytes()),
+                ("positions", positions.tobytes()),
+                ("next_positions", next_positions.tobytes()),
+                ("move_states", move_states.tobytes()),
+                ("hosts", hosts.tobytes()),
+                ("ports", ports.tobytes()),
+                ("grid", grid.tobytes()),
+                ("names", names_blob),
+            ]:
+                offset, length = layout[section]
+                mm[offset:offset + length] = data
+            mm.flush()
+
+
+class Checkpoint(MappedFile):
+    """A read-only view over a checkpoint file
+
+    The integer sections are memoryviews over the mapped file, so loading a
+    checkpoint does not copy the peer tables or the grid. A checkpoint cut
+    short, e.g. by a crash, is refused.
+
+    Attributes:
+        round (int): the server's round when the checkpoint was taken
+        size (int): the area's side size
+        num_peers (int): the number of peers
+        positions (memoryview): x, y pairs of every peer
+        next_positions (memoryview): x, y pairs of every peer's pending move
+        move_states (memoryview): the packed pending moves (see `encode_move_state`)
+        hosts (memoryview): the IPv4 address of every peer as an integer
+        ports (memoryview): the port of every peer
+        grid (memoryview): the occupancy grid in row-major order
+    """
+    def __init__(self, path: str | Path):
+        super().__init__(path, "checkpoint")
+        (
+            self.round, self.size, self.num_peers, names_bytes,
+            self._rng_version, rng_has_gauss, rng_gauss
+        ) = self._read_header(HEADER, MAGIC, VERSION)
+        self._rng_gauss: float | None = rng_gauss if rng_has_gauss else None
+        self._layout = _layout(self.size, self.num_peers, names_bytes)
+        if len(self._mm) < self._layout["total"][0]:
+            length: int = len(self._mm)
+            self.close()
+            raise ValueError(f"{path} is truncated: {length} of {self._layout['total'][0]} bytes")
+
+        self._rng_state: memoryview = self._section(*self._layout["rng_state"], "I")
+        self.positions: memoryview = self._section(*self._layout["positions"], "i")
+        self.next_positions: memoryview = self._section(*self._layout["next_positions"], "i")
+        self.move_states: memoryview = self._section(*self._layout["move_states"], "i")
+        self.hosts: memoryview = self._section(*self._layout["hosts"], "I")
+        self.ports: memoryview = self._section(*self._layout["ports"], "i")
+        self.grid: memoryview = self._section(*self._layout["grid"], "i")
+        self._names: list[str] = None
+
+    def get_names(self) -> list[str]:
+        """Returns the peers' names, decoded on first use"""
+        if self._names is None:
+            self._names = self._read_names(*self._layout["names"])
+        return self._names
+
+    def get_pos(self, index: int) -> tuple[int, int]:
+        """Returns the position of the peer with the given index"""
+        return (self.positions[2 * index], self.positions[2 * index + 1])
+
+    def get_move_state(self, index: int) -> tuple[tuple[int, int], list[str]]:
+        """Returns the pending next_pos and random directions of a peer"""
+        has_next_pos, random_directions = decode_move_state(self.move_states[index])
+        next_pos = (self.next_positions[2 * index], self.next_positions[2 * index + 1]) if has_next_pos else None
+        return next_pos, random_directions
+
+    def get_source_address(self, index: int) -> tuple[str, int]:
+        """Returns the address the peer with the given index listened to when
+        the checkpoint was taken. Restored peers bind new ports"""
+        host: str = socket.inet_ntoa(struct.pack("!I", self.hosts[index]))
+        return (host, self.ports[index])
+
+    def get_occupant(self, x: int, y: int) -> int:
+        """Returns the index of the peer at (x, y), or EMPTY (-1) if the cell is empty"""
+        return self.grid[x * self.size + y]
+
+    def get_rng_state(self) -> tuple:
+        """Returns the state of `random` in the format of `random.getstate`"""
+        return (self._rng_version, tuple(self._rng_state), self._rng_gauss)
+
+
+def load_checkpoint(path: str | Path) -> Checkpoint:
+    """Maps a checkpoint file written by `write_checkpoint`"""
+    return Checkpoint(path)
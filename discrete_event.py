@@ -0,0 +1,327 @@
+import argparse
+import heapq
+import random
+import time
+from server import Server
+from peer import Peer
+from message import Message, SERVER_ID
+from round_tracer import RoundTracer
+from event_log import EventLogWriter, SENT
+from profiler import TIMERS
+from utils import generate_names, get_initial_positions
+
+
+class EventEngine:
+    """A single-threaded discrete-event scheduler with a virtual clock
+
+    Events are kept in a priority queue ordered by their virtual time. Events
+    scheduled for the same time run in the order they were scheduled. The
+    engine can be passed to the server and the peers in place of a
+    `Threadpool`, in which case their tasks run as immediate events.
+
+    Attributes:
+        now (float): the current virtual time in seconds
+        queue (list[tuple[float, int, function, tuple]]): the pending events
+        sequence (int): the number of events scheduled so far
+        processed (int): the number of events that have run
+        nodes (dict[tuple[str, int], Server | Peer]): the node listening to each address
+        latency (float): the base one-way delay of every message, in seconds
+        jitter (float): the maximum extra delay added to the latency of a message
+        rng (Random): draws the jitter, independently of the peers' moves
+        wire_format (bool): whether messages are encoded and decoded on delivery
+        delivered (int): the number of messages delivered
+    """
+    def __init__(self, latency: float = 0.001, jitter: float = 0.0, seed: int = None, wire_format: bool = False):
+        self.now: float = 0.0
+        self.queue: list[tuple[float, int, "function", tuple]] = []
+        self.sequence: int = 0
+        self.processed: int = 0
+        self.nodes: dict[tuple[str, int], "Server | Peer"] = {}
+        self.latency: float = latency
+        self.jitter: float = jitter
+        self.rng: random.Random = random.Random(seed)
+        self.wire_format: bool = wire_format
+        self.delivered: int = 0
+
+    def get_time(self) -> float:
+        """Returns the current virtual time"""
+        return self.now
+
+    def schedule(self, delay: float, func: "function", args=()):
+        """Schedules a function to run after `delay` virtual seconds"""
+        heapq.heappush(self.queue, (self.now + delay, self.sequence, func, args))
+        self.sequence += 1
+
+    def add_task(self, func: "function", args=(), kwargs={}):
+        """Runs a task as the next event at the current time, like `Threadpool.add_task`"""
+        if kwargs:
+            self.schedule(0, lambda: func(*args, **kwargs))
+        else:
+            self.schedule(0, func, args)
+
+    def terminate(self):
+        """Drops every pending event"""
+        self.queue.clear()
+
+    def register(self, address: tuple[str, int], node: "Server | Peer"):
+        """Makes a node reachable at an address"""
+        self.nodes[tuple(address)] = node
+
+    def deliver(self, destination: tuple[str, int], message: Message, delay: float = 0.0):
+        """Delivers a message to the node at destination after the link latency
+
+        Args:
+            destination (tuple[str, int]): the address of the receiving node, as registered
+            message (Message): the message
+            delay (float): an extra delay on top of the link latency, e.g. idle time
+        """
+        if self.wire_format:
+            message = Message.decode(message.encode())
+        latency: float = self.latency + delay
+        if self.jitter:
+            latency += self.rng.uniform(0, self.jitter)
+        self.delivered += 1
+        self.schedule(latency, self.nodes[destination].handle_message, (message, ))
+
+    def run(self):
+        """Runs events in virtual time order until none are left"""
+        queue = self.queue
+        heappop = heapq.heappop
+        while queue:
+            self.now, _, func, args = heappop(queue)
+            func(*args)
+            self.processed += 1
+
+
+class VirtualServer(Server):
+    """A server whose messages travel through an `EventEngine` instead of sockets
+
+    Attributes:
+        engine (EventEngine): the simulation's engine
+        logging (bool): whether messages are written to the log
+    """
+    __slots__ = ("engine", "logging")
+
+    def __init__(self, engine: EventEngine, size: int, max_peers: int, END_ROUND: int, logging: bool = False, **kwargs):
+        super().__init__(0, size, max_peers, END_ROUND, engine, **kwargs)
+        self.engine: EventEngine = engine
+        self.logging: bool = logging
+        engine.register(self.SERVER_ADDRESS, self)
+
+    def log(self, message, *args):
+        if self.logging:
+            super().log(message, *args)
+
+    def log_important(self, message):
+        if self.logging:
+            super().log_important(message)
+
+    def start(self):
+        """The virtual server has no serving module"""
+
+    def join(self):
+        """The virtual server has no serving module"""
+
+    def wait_for_scans(self):
+        """Scans in flight are delivered before the TERM messages, which are sent later"""
+
+    def wait_for_peers(self):
+        """Virtual peers are reachable as soon as they register with the engine"""
+        for peer in self.peers:
+            self.addresses[peer.get_id()] = peer.get_source_address()
+
+    def connect(self, peer_id: int, message: Message, destination: tuple[str, int]):
+        """Delivers a message to a peer through the engine"""
+        peer_name = self.names[peer_id]
+        if self.tracer and message.get_title() == "PASR":
+            self.tracer.record(message.get_round(), peer_name, "PASR_SENT")
+        if self.event_log:
+            self.event_log.record(message.get_round(), SERVER_ID, message.get_title(), SENT, peer_id)
+        self.engine.deliver(destination, message)
+        self.log("Send %s message to %s", message.get_title(), peer_name)
+
+
+class VirtualPeer(Peer):
+    """A peer whose messages travel through an `EventEngine` instead of sockets
+
+    Attributes:
+        engine (EventEngine): the simulation's engine
+        logging (bool): whether messages are written to the log
+        idle_time (float): the longest pause of the peer before answering a PASR
+        idle_delay (float): the pause added to the peer's next message
+    """
+    __slots__ = ("engine", "logging", "idle_time", "idle_delay")
+
+    def __init__(
+            self,
+            engine: EventEngine,
+            peer_id: int,
+            name: str,
+            pos: tuple[int, int],
+            port: int,
+            END_ROUND: int,
+            server_address: tuple[str, int],
+            radio_range: int,
+            idle_time: float = 0.0,
+            logging: bool = False,
+            **kwargs
+            ):
+        super().__init__(peer_id, name, pos, port, END_ROUND, server_address, radio_range, engine, **kwargs)
+        self.engine: EventEngine = engine
+        self.logging: bool = logging
+        self.idle_time: float = idle_time
+        self.idle_delay: float = 0.0
+        engine.register(self.SOURCE_ADDRESS, self)
+
+    def log(self, message: str, *args):
+        if self.logging:
+            super().log(message, *args)
+
+    def log_pos(self):
+        if self.logging:
+            super().log_pos()
+
+    def start(self):
+        """The virtual peer has no serving module"""
+
+    def join(self):
+        """The virtual peer has no serving module"""
+
+    def remain_idle(self, seconds: float):
+        """Simulates action pauses in virtual time by delaying the next message"""
+        self.idle_delay = random.uniform(0, seconds)
+
+    def handle_message(self, message: Message):
+        if self.idle_time and message.get_title() == "PASR":
+            self.remain_idle(self.idle_time)
+        super().handle_message(message)
+
+    def connect(self, destination: tuple[str, int], recipient: str, message: Message):
+        """Delivers a message through the engine"""
+        if self.tracer:
+            self.tracer.record(message.get_round(), self.name, message.get_title())
+        if self.event_log:
+            self.event_log.record(message.get_round(), self.id, message.get_title(), SENT, SERVER_ID)
+        self.engine.deliver(destination, message, self.idle_delay)
+        self.idle_delay = 0.0
+        self.log("Send %s message to %s", message.get_title(), recipient)
+
+
+def run_virtual_simulation(
+        area_size: int,
+        max_peers: int,
+        max_round: int,
+        radio_range: int,
+        latency: float = 0.001,
+        jitter: float = 0.0,
+        idle_time: float = 0.0,
+        seed: int = None,
+        logging: bool = False,
+        wire_format: bool = False,
+        round_trace_path: str = None,
+        event_log_path: str = None,
+        timers: bool = False,
+        **server_kwargs
+        ) -> dict:
+    """Runs the IPPS protocol on a discrete-event engine in virtual time
+
+    The server and the peers use the same message handlers as the socket
+    version, but every message is an event delivered after a simulated link
+    latency, so the run does not depend on threads, sockets or host load.
+
+    Args:
+        area_size (int): the length (in units) of the side of the simulation area
+        max_peers (int): the number of peers in the simulation
+        max_round (int): the maximum round the simulation will run
+        radio_range (int): WiFi range
+        latency (float): the one-way delay of every message, in virtual seconds
+        jitter (float): the maximum random delay added to every message
+        idle_time (float): the longest random pause of a peer before it answers a PASR
+        seed (int): seeds the peers' moves and the jitter, for reproducible runs
+        logging (bool): whether messages are written to `log.txt`
+        wire_format (bool): whether every message is encoded and decoded on delivery
+        round_trace_path (str): if specified, the critical path report is written to this file
+        event_log_path (str): if specified, every message is recorded to this event log,
+        timestamped in virtual time
+        timers (bool): whether the hot path timers record during the run. They
+        are off by default, since a timer per message slows the engine down
+        server_kwargs: passed to the `Server`, e.g. checkpoint_rounds or trace_path
+
+    Returns:
+        (dict): the virtual time, wall time, rounds and number of events of the run
+    """
+    if seed is not None:
+        random.seed(seed)
+    engine = EventEngine(latency, jitter, seed, wire_format)
+    tracer: RoundTracer = RoundTracer(engine.get_time) if round_trace_path else None
+    names: list[str] = list(generate_names(max_peers))
+    event_log: EventLogWriter = EventLogWriter(event_log_path, names, clock=engine.get_time) if event_log_path else None
+    server = VirtualServer(engine, area_size, max_peers, max_round, logging, tracer=tracer, event_log=event_log, **server_kwargs)
+
+    peers: list[VirtualPeer] = [
+        VirtualPeer(
+            engine, i, names[i], pos, i + 1, max_round, server.SERVER_ADDRESS, radio_range, idle_time, logging,
+            log_positions=server.trace_path is None, tracer=tracer, event_log=event_log
+        )
+        for i, pos in enumerate(get_initial_positions(area_size, max_peers))
+    ]
+
+    timers_enabled: bool = TIMERS.enabled
+    TIMERS.enabled = timers
+    start_time: float = time.perf_counter()
+    try:
+        server.bootstrap(peers)
+        engine.run()
+    finally:
+        TIMERS.enabled = timers_enabled
+    wall_time: float = time.perf_counter() - start_time
+
+    if event_log:
+        event_log.close()
+        print(f"Event log written to {event_log.path}")
+    if tracer:
+        print(f"Round trace report written to {tracer.write_report(round_trace_path)}")
+    return {
+        "virtual_time": engine.now,
+        "wall_time": wall_time,
+        "rounds": server.get_round(),
+        "events": engine.processed,
+        "messages": engine.delivered,
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    """Parses the command line arguments of a virtual run"""
+    parser = argparse.ArgumentParser(description="Simulates a p2p network using the IPPS algorithm in virtual time")
+    parser.add_argument("--area-size", type=int, default=10)
+    parser.add_argument("--peers", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--radio-range", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.001, help="one-way link latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="maximum extra latency in seconds")
+    parser.add_argument("--idle-time", type=float, default=0.0, help="maximum peer pause before answering a PASR")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--log", action="store_true", help="write every message to log.txt")
+    parser.add_argument("--wire-format", action="store_true", help="encode and decode every message")
+    parser.add_argument("--round-trace", help="write the critical path of every round to this file")
+    parser.add_argument("--event-log", help="record every message to this structured event log")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = run_virtual_simulation(
+        args.area_size,
+        args.peers,
+        args.rounds,
+        args.radio_range,
+        latency=args.latency,
+        jitter=args.jitter,
+        idle_time=args.idle_time,
+        seed=args.seed,
+        logging=args.log,
+        wire_format=args.wire_format,
+        round_trace_path=args.round_trace,
+        event_log_path=args.event_log
+    )
+    print(results)
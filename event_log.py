@@ -0,0 +1,202 @@
+import struct
+import threading
+import time
+from array import array
+from pathlib import Path
+from binary_file import MappedFile, align, encode_names, write_preamble
+
+MAGIC = b"IPPSEVLG"
+VERSION = 1
+# magic, version, num_peers, names_bytes
+HEADER = struct.Struct("<8sIiI")
+# rows, min_round, max_round, padding
+CHUNK = struct.Struct("<iii4x")
+
+TITLES: tuple[str] = ("PASR", "RQMV", "OKMV", "DNMV", "FNMV", "SCAN", "PWIR", "TERM", "READY")
+TITLE_CODES: dict[str, int] = {title: code for code, title in enumerate(TITLES)}
+RECEIVED = 0
+SENT = 1
+# every (title, kind) pair is a single byte: the title code followed by the kind bit
+NUM_EVENTS = 2 * len(TITLES)
+
+
+def encode_event(title: str, kind: int) -> int:
+    """Packs a message title and its kind (RECEIVED or SENT) into a byte"""
+    return TITLE_CODES[title] << 1 | kind
+
+
+def decode_event(event: int) -> tuple[str, int]:
+    """Unpacks a byte packed by `encode_event` into the title and the kind"""
+    return TITLES[event >> 1], event & 1
+
+
+def _column_offsets(rows: int) -> dict[str, tuple[int, int]]:
+    """Returns the offset, relative to the chunk header, and size of every column of a chunk
+
+    The columns are stored one after the other, each aligned to 8 bytes:
+    timestamps (float64), rounds, peers and counterparts (int32) and events (uint8)
+    """
+    offsets: dict[str, tuple[int, int]] = {}
+    offset: int = CHUNK.size
+    for column, itemsize in [("timestamps", 8), ("rounds", 4), ("peers", 4), ("counterparts", 4), ("events", 1)]:
+        offsets[column] = (offset, rows * itemsize)
+        offset = align(offset + rows * itemsize)
+    offsets["total"] = (offset, 0)
+    return offsets
+
+
+class EventLogWriter:
+    """Appends every message a node sends or receives to a columnar binary log
+
+    Records are buffered in one typed array per column and written as a chunk
+    every `chunk_rows` records. The header of each chunk holds its number of
+    rows and the lowest and highest round in it, so that readers can answer
+    per-round queries without looking at the rows of single-round chunks.
+
+    Attributes:
+        path (Path): the log file
+        num_peers (int): the number of peers, whose names are in the header
+        chunk_rows (int): the number of records in a full chunk
+        clock (function): returns the timestamp of a record
+        lock (Lock): guards the column buffers, which all nodes append to
+        rows (int): the number of records written so far
+        file (BufferedWriter): the open log file
+    """
+    def __init__(self, path: str | Path, names: list[str], chunk_rows: int = 65536, clock: "function" = time.time):
+        self.path: Path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.num_peers: int = len(names)
+        self.chunk_rows: int = chunk_rows
+        self.clock: "function" = clock
+        self.lock: threading.Lock = threading.Lock()
+        self.rows: int = 0
+        self._timestamps: array = array("d")
+        self._rounds: array = array("i")
+        self._peers: array = array("i")
+        self._counterparts: array = array("i")
+        self._events: array = array("B")
+        names_blob: bytes = encode_names(names)
+        self.file = open(self.path, "wb")
+        write_preamble(self.file, HEADER, MAGIC, VERSION, self.num_peers, len(names_blob), names_blob=names_blob)
+
+    def record(self, round: int, peer_id: int, title: str, kind: int, counterpart: int):
+        """Records a message
+
+        Args:
+            round (int): the round of the message
+            peer_id (int): the id of the node that sent or received it, SERVER_ID for the server
+            title (str): the title of the message
+            kind (int): RECEIVED or SENT
+            counterpart (int): the id of the other node
+        """
+        event: int = encode_event(title, kind)
+        with self.lock:
+            self._timestamps.append(self.clock())
+            self._rounds.append(round)
+            self._peers.append(peer_id)
+            self._counterparts.append(counterpart)
+            self._events.append(event)
+            if len(self._events) >= self.chunk_rows:
+                self._write_chunk()
+
+    def _write_chunk(self):
+        """Writes the buffered records as a chunk. The lock must be held"""
+        rows: int = len(self._events)
+        offsets = _column_offsets(rows)
+        chunk = bytearray(offsets["total"][0])
+        CHUNK.pack_into(chunk, 0, rows, min(self._rounds), max(self._rounds))
+        for name, column in [
+            ("timestamps", self._timestamps),
+            ("rounds", self._rounds),
+            ("peers", self._peers),
+            ("counterparts", self._counterparts),
+            ("events", self._events),
+        ]:
+            offset, size = offsets[name]
+            chunk[offset:offset + size] = column.tobytes()
+            del column[:]
+        self.file.write(chunk)
+        self.rows += rows
+
+    def close(self):
+        """Writes the last, partial chunk and closes the log file"""
+        with self.lock:
+            if self._events:
+                self._write_chunk()
+            self.file.close()
+
+
+class EventChunk:
+    """The columns of one chunk of an event log, as memoryviews of the mapped file
+
+    Attributes:
+        min_round (int): the lowest round in the chunk
+        max_round (int): the highest round in the chunk
+        timestamps (memoryview): the timestamp of every record, as float64
+        rounds (memoryview): the round of every record, as int32
+        peers (memoryview): the node of every record, as int32
+        counterparts (memoryview): the other node of every record, as int32
+        events (memoryview): the title and kind of every record, see `encode_event`
+    """
+    def __init__(self, buffer: memoryview, offset: int):
+        rows, self.min_round, self.max_round = CHUNK.unpack_from(buffer, offset)
+        offsets = _column_offsets(rows)
+        for name, format in [("timestamps", "d"), ("rounds", "i"), ("peers", "i"), ("counterparts", "i"), ("events", "B")]:
+            start, size = offsets[name]
+            setattr(self, name, buffer[offset + start:offset + start + size].cast(format))
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def release(self):
+        """Releases the columns, so that the log file can be unmapped"""
+        for column in [self.timestamps, self.rounds, self.peers, self.counterparts, self.events]:
+            column.release()
+
+
+class EventLogReader(MappedFile):
+    """Memory-maps an event log written by `EventLogWriter`
+
+    A chunk cut short by a crash is ignored.
+
+    Attributes:
+        num_peers (int): the number of peers in the log
+        num_rows (int): the number of records in the complete chunks
+    """
+    def __init__(self, path: str | Path):
+        super().__init__(path, "event log")
+        self.num_peers, names_bytes = self._read_header(HEADER, MAGIC, VERSION)
+        self._names_bytes: int = names_bytes
+        self._names: list[str] = None
+        self._offsets: list[int] = []
+        self.num_rows: int = 0
+        offset: int = align(HEADER.size + names_bytes)
+        while offset + CHUNK.size <= len(self._mm):
+            rows: int = CHUNK.unpack_from(self._mm, offset)[0]
+            size: int = _column_offsets(rows)["total"][0]
+            if offset + size > len(self._mm):
+                break
+            self._offsets.append(offset)
+            self.num_rows += rows
+            offset += size
+
+    def get_names(self) -> list[str]:
+        """Returns the peers' names, by peer id"""
+        if self._names is None:
+            self._names = self._read_names(HEADER.size, self._names_bytes)
+        return self._names
+
+    def get_chunks(self) -> "generator":
+        """Creates a generator that yields the chunks of the log, in write order
+
+        The columns of a chunk are released when the next one is yielded
+
+        Yields:
+            (EventChunk): the columns of the next chunk
+        """
+        for offset in self._offsets:
+            chunk = EventChunk(self._view, offset)
+            try:
+                yield chunk
+            finally:
+                chunk.release()
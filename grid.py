@@ -0,0 +1,75 @@
+# the value of a cell that holds no peer
+EMPTY = -1
+
+
+class Grid:
+    """The occupancy grid and position table of a simulation area
+
+    The grid holds the id of the peer in each cell (row-major) or EMPTY, and
+    the position table holds the x, y pair of every peer. Both are int32
+    buffers, e.g. arrays for a server or memoryviews of shared memory for a
+    `SharedArea`.
+
+    Moves are committed under one of `locks`, chosen by the target cell, so
+    that two peers can never claim the same cell while moves to unrelated
+    cells proceed in parallel. Range queries read the grid without locking.
+
+    Attributes:
+        SIZE (int): the area's side size
+        grid (array[int] | memoryview): the id of the peer in each cell, or EMPTY
+        positions (array[int] | memoryview): the x, y pair of every peer, by id
+        locks (list[Lock]): the locks that guard the move commits
+    """
+    __slots__ = ("SIZE", "grid", "positions", "locks")
+
+    def __init__(self, size: int, grid: "array | memoryview", positions: "array | memoryview", locks: list["Lock"]):
+        self.SIZE: int = size
+        self.grid: "array | memoryview" = grid
+        self.positions: "array | memoryview" = positions
+        self.locks: list["Lock"] = locks
+
+    def place(self, peer_id: int, pos: tuple[int, int]):
+        """Places a peer on the area before the simulation starts"""
+        x, y = pos
+        self.grid[x * self.SIZE + y] = peer_id
+        self.positions[2 * peer_id] = x
+        self.positions[2 * peer_id + 1] = y
+
+    def get_pos(self, peer_id: int) -> tuple[int, int]:
+        """Returns the position of a peer"""
+        return (self.positions[2 * peer_id], self.positions[2 * peer_id + 1])
+
+    def change_pos(self, peer_id: int, current_pos: tuple[int, int], new_pos: tuple[int, int]) -> bool:
+        """Checks to see if the move is legal.
+
+        If the move is legal, it updates the grid and the position table and
+        returns True. Otherwise it returns False
+        """
+        x, y = new_pos
+        if not (0 <= x < self.SIZE and 0 <= y < self.SIZE):
+            return False
+        cell: int = x * self.SIZE + y
+        with self.locks[cell % len(self.locks)]:
+            if self.grid[cell] != EMPTY:
+                return False
+            self.grid[cell] = peer_id
+        # only the peer itself writes its old cell and its position
+        self.grid[current_pos[0] * self.SIZE + current_pos[1]] = EMPTY
+        self.positions[2 * peer_id] = x
+        self.positions[2 * peer_id + 1] = y
+        return True
+
+    def find_peers(self, peer_pos: tuple[int, int], radio_range: int) -> list[int]:
+        """Finds the ids of the peers that are within range of a position"""
+        x0, y0 = peer_pos
+        size: int = self.SIZE
+        y_start: int = max(y0 - radio_range, 0)
+        y_end: int = min(y0 + radio_range, size - 1) + 1
+        grid = self.grid
+        peers_in_vicinity: list[int] = []
+        for x in range(max(x0 - radio_range, 0), min(x0 + radio_range, size - 1) + 1):
+            row: int = x * size
+            for y, peer_id in enumerate(grid[row + y_start:row + y_end], y_start):
+                if peer_id != EMPTY and not (x == x0 and y == y0):
+                    peers_in_vicinity.append(peer_id)
+        return peers_in_vicinity
@@ -4,6 +4,9 @@ import logging
 from datetime import datetime
 import sys
 
+# the name of the logger shared by the server and every peer
+LOGGER_NAME = "SIM"
+
 class CustomFormatter(logging.Formatter):
     """A custom formatter that logs microseconds in the datefmt"""
 
@@ -26,16 +29,32 @@ class CustomFormatter(logging.Formatter):
             timestamp = ct.strftime('%Y-%m-%d %H:%M:%S.%')
         return timestamp
     
-def create_logger() -> logging.Logger:
+def create_logger(log_dir: str = None) -> logging.Logger:
     """Create a custom logger that saves logs in the `log.txt` file
+
+    The logger is shared by the server and every peer. If it already writes to
+    a file and no log_dir is specified, it is returned as is. Otherwise its
+    previous file is closed and it starts writing to `log.txt` inside log_dir
+    (or the working directory)
+
+    Args:
+        log_dir (str): the directory of the `log.txt` file
     
     Returns:
         (logging.Logger): the custom logger
     """
-    logger = logging.getLogger("SIM")
+    logger = logging.getLogger(LOGGER_NAME)
+    if logger.handlers and log_dir is None:
+        return logger
+    for old_handler in list(logger.handlers):
+        logger.removeHandler(old_handler)
+        old_handler.close()
+
+    filepath: Path = Path(log_dir or ".").joinpath("log.txt")
+    filepath.parent.mkdir(parents=True, exist_ok=True)
     logger.setLevel(logging.INFO)
     formatter = CustomFormatter('%(levelname)s - %(asctime)s - [peer_name=%(peer_name)s] - [round=%(round)s] - %(message)s', datefmt='%H:%M:%S:%f')
-    handler = logging.FileHandler("log.txt", "w")
+    handler = logging.FileHandler(filepath, "w")
     handler.setLevel(logging.INFO)
     handler.setFormatter(formatter)
     logger.addHandler(handler)
@@ -1,4 +1,8 @@
 import subprocess
+import sys
+from collections import Counter, defaultdict
+from itertools import compress
+from event_log import EventLogReader, NUM_EVENTS, RECEIVED, SENT, decode_event, encode_event
 
 def run_log_terminal(name="None", round="None"):
     """Executes the logging process
@@ -13,11 +17,88 @@ def run_log_terminal(name="None", round="None"):
         shell=True
     )
 
+def count_messages_per_round(path: str) -> dict[int, dict[str, int]]:
+    """Counts the messages sent in every round of an event log, per title
+
+    The events column of a chunk that holds a single round is counted with
+    `bytes.count`, which runs at memory speed. Other chunks are counted with a
+    Counter over their rounds and events columns
+
+    Args:
+        path (str): the event log
+
+    Returns:
+        (dict[int, dict[str, int]]): the number of messages per title, by round
+    """
+    counts: dict[int, Counter] = defaultdict(Counter)
+    with EventLogReader(path) as reader:
+        for chunk in reader.get_chunks():
+            if chunk.min_round == chunk.max_round:
+                events: bytes = chunk.events.tobytes()
+                for event in range(SENT, NUM_EVENTS, 2):
+                    count: int = events.count(event)
+                    if count:
+                        counts[chunk.min_round][decode_event(event)[0]] += count
+            else:
+                for (round, event), count in Counter(zip(chunk.rounds, chunk.events)).items():
+                    title, kind = decode_event(event)
+                    if kind == SENT:
+                        counts[round][title] += count
+    return {round: dict(titles) for round, titles in sorted(counts.items())}
+
+def count_events_per_round(path: str) -> dict[int, int]:
+    """Counts the records (messages sent and received) of every round of an event log"""
+    counts: Counter = Counter()
+    with EventLogReader(path) as reader:
+        for chunk in reader.get_chunks():
+            if chunk.min_round == chunk.max_round:
+                counts[chunk.min_round] += len(chunk)
+            else:
+                counts.update(chunk.rounds)
+    return dict(sorted(counts.items()))
+
+def get_denied_move_rates(path: str) -> dict[str, float]:
+    """Computes the share of the move requests of every peer that the server denied
+
+    Returns:
+        (dict[str, float]): the DNMV messages received over the RQMV messages
+        sent, by peer name
+    """
+    # maps the events column to a mask of the rows to keep, at memory speed
+    requested_mask: bytes = bytes(int(event == encode_event("RQMV", SENT)) for event in range(256))
+    denied_mask: bytes = bytes(int(event == encode_event("DNMV", RECEIVED)) for event in range(256))
+    requested: Counter = Counter()
+    denied: Counter = Counter()
+    with EventLogReader(path) as reader:
+        names: list[str] = reader.get_names()
+        for chunk in reader.get_chunks():
+            events: bytes = chunk.events.tobytes()
+            requested.update(compress(chunk.peers, events.translate(requested_mask)))
+            denied.update(compress(chunk.peers, events.translate(denied_mask)))
+    return {
+        name: denied[peer_id] / requested[peer_id] if requested[peer_id] else 0.0
+        for peer_id, name in enumerate(names)
+    }
+
+def display_event_log_summary(path: str):
+    """Prints the messages and events of every round and the peers with the most denied moves"""
+    events_per_round: dict[int, int] = count_events_per_round(path)
+    for round, titles in count_messages_per_round(path).items():
+        messages: str = ", ".join(f"{title}={count}" for title, count in sorted(titles.items()))
+        print(f"Round {round}: {events_per_round.get(round, 0)} events - {messages}")
+    print()
+    rates: dict[str, float] = get_denied_move_rates(path)
+    print("Denied moves:")
+    for name, rate in sorted(rates.items(), key=lambda item: item[1], reverse=True)[:10]:
+        print(f"{name:<20}{rate:>8.1%}")
+    print()
+
 def display_interface():
     """Displays the interface of the logging process"""
     print("Press 1 to select peer")
     print("Press 2 to select round")
     print("Press 3 to select peer and round")
+    print("Press 4 to summarize an event log")
     print("Press q to exit")
     print()
 
@@ -27,6 +108,7 @@ def main():
     Selecting `1` will show the logs of the specified peer
     Selecting `2` will show all the logs that happened during the specified round
     Selecting `3` will show all the logs of specified peer during the specified round
+    Selecting `4` will summarize the rounds and the denied moves of an event log
     Selecting `q` will quit the loop
     Selecting anything else has no effect and restarts the loop
 
@@ -44,6 +126,9 @@ def main():
                 input_name = input("Select a name: ")
                 input_round = input("Select a round: ")
                 run_log_terminal(name=input_name, round=input_round)
+            elif input_action == "4":
+                input_path = input("Select an event log: ")
+                display_event_log_summary(input_path)
             elif input_action == "q":
                 exit()
             else:
@@ -51,4 +136,8 @@ def main():
                 print()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # an event log can also be summarized without the interface
+    if len(sys.argv) > 1:
+        display_event_log_summary(sys.argv[1])
+    else:
+        main()
\ No newline at end of file
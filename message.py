@@ -1,19 +1,40 @@
 import json
+from profiler import timed
+
+FRAME_DELIMITER = b"\n"
+# the sender id of the messages of the server, peers have ids from 0 onwards
+SERVER_ID = -1
 
 class Message:
     """A message form for peers to exchange information
+
+    Encoded messages are JSON objects terminated by a newline, so several of
+    them can be sent in a single write
     
     Attributes:
         data (dict): the dictionary with all the message features
             - title (str): the title of the message
             - round (int): the current round the peer is
-            - name (int): the name of the peer
+            - sender (int): the id of the sending peer, or SERVER_ID
             - source_address (tuple[str, int]): the address the peer actively listens to
-            - content (str): the rest of the message's content
+            - content: the rest of the message's content, e.g. the current and the
+            next position of a RQMV. Positions decode as lists
 
     """
 
+    @staticmethod
+    def split_frames(buffer: bytes) -> tuple[list[bytes], bytes]:
+        """Splits a datastream into complete encoded messages
+
+        Returns:
+            (tuple[list[bytes], bytes]): the complete frames and the incomplete
+            rest of the buffer
+        """
+        *frames, rest = buffer.split(FRAME_DELIMITER)
+        return frames, rest
+
     @classmethod
+    @timed("Message.decode")
     def decode(cls, data: bytes) -> "Message":
         """Decodes datastream into a Message format"""
         js: str = data.decode()
@@ -21,7 +42,7 @@ class Message:
         message: Message = cls(
             title=payload["TITLE"],
             round=payload["ROUND"],
-            name=payload["NAME"],
+            sender=payload["SENDER"],
             source_address=tuple(payload["SOURCE_ADDRESS"]),
             content=payload["CONTENT"]
         )
@@ -32,14 +53,14 @@ class Message:
             self,
             title: str,
             round: int,
-            name: str,
+            sender: int,
             source_address: tuple[str, int],
             content: str
             ):
         self.data = {
             "TITLE": title,
             "ROUND": round,
-            "NAME": name,
+            "SENDER": sender,
             "SOURCE_ADDRESS": source_address,
             "CONTENT": content
         }
@@ -52,9 +73,9 @@ class Message:
         """Returns the message's round attribute"""
         return self.data["ROUND"]
     
-    def get_name(self) -> str:
-        """Returns the message's name attribute"""
-        return self.data["NAME"]
+    def get_sender(self) -> int:
+        """Returns the message's sender attribute"""
+        return self.data["SENDER"]
     
     def get_source_address(self) -> tuple[str, int]:
         """Returns the message's source_address attribute"""
@@ -64,12 +85,13 @@ class Message:
         """Returns the message's content attribute"""
         return self.data["CONTENT"]
     
+    @timed("Message.encode")
     def encode(self) -> bytes:
         """Encodes the message"""
         js = json.dumps(self.data)
-        return js.encode()
+        return js.encode() + FRAME_DELIMITER
     
 if __name__ == "__main__":
-    a = Message("AAAA", 1, "Olivia", ("127.0.0.1", 65432), "(1, 2)|(2, 3)").encode()
+    a = Message("AAAA", 1, 0, ("127.0.0.1", 65432), "(1, 2)|(2, 3)").encode()
     b = Message.decode(a)
     print(b.get_content())
@@ -0,0 +1,194 @@
+import argparse
+import multiprocessing
+import os
+import random
+import time
+from pathlib import Path
+from threading import BrokenBarrierError
+import log
+from peer import Peer
+from position_trace import TraceWriter
+from shared_area import SharedArea
+from utils import generate_names, get_initial_positions
+
+
+def run_worker(
+        worker: int,
+        peer_ids: list[int],
+        names: list[str],
+        spec: tuple,
+        barrier: "Barrier",
+        max_round: int,
+        radio_range: int,
+        seed: int,
+        log_dir: str,
+        stats: "Queue"
+        ):
+    """Moves a group of peers every round, inside a worker process
+
+    Every peer tries its random moves in order, committing each one straight
+    to the shared area, and then scans the area around its position. The
+    workers meet at the round barrier twice per round: once when every peer
+    has moved and once when the coordinator starts the next round.
+
+    Args:
+        worker (int): the index of the worker
+        peer_ids (list[int]): the ids of the peers of this worker
+        names (list[str]): the names of all peers, by id
+        spec (tuple): the spec of the shared area, see `SharedArea.get_spec`
+        barrier (Barrier): the round barrier, shared with the coordinator
+        max_round (int): the maximum round the simulation will run
+        radio_range (int): WiFi range
+        seed (int): if specified, the seed of the worker is seed + worker
+        log_dir (str): the directory of the worker's `log.txt`
+        stats (Queue): receives the move counters of the worker at the end
+    """
+    area: SharedArea = SharedArea.attach(spec)
+    try:
+        log.create_logger(str(Path(log_dir).joinpath(f"worker_{worker}")))
+        if seed is not None:
+            random.seed(seed + worker)
+        peers: list[Peer] = [
+            Peer(peer_id, names[peer_id], area.get_pos(peer_id), 0, max_round, None, radio_range, None)
+            for peer_id in peer_ids
+        ]
+        moves: int = 0
+        denied_moves: int = 0
+        neighbors: int = 0
+        for round in range(1, max_round):
+            for peer_id, peer in zip(peer_ids, peers):
+                peer.round = round
+                while True:
+                    next_pos = peer.select_move()
+                    if not next_pos:
+                        break
+                    if area.change_pos(peer_id, peer.pos, next_pos):
+                        peer.pos = next_pos
+                        peer.next_pos = None
+                        moves += 1
+                        break
+                    denied_moves += 1
+                peer.peers_in_vicinity = area.find_peers(peer.pos, radio_range)
+                neighbors += len(peer.peers_in_vicinity)
+            # the round ends, then the coordinator starts the next one
+            barrier.wait()
+            barrier.wait()
+        stats.put((worker, moves, denied_moves, neighbors))
+    except BaseException:
+        barrier.abort()
+        raise
+    finally:
+        area.close()
+
+
+def run_multiprocess_simulation(
+        area_size: int,
+        max_peers: int,
+        max_round: int,
+        radio_range: int,
+        workers: int = None,
+        seed: int = None,
+        trace_path: str = None,
+        log_dir: str = "."
+        ) -> dict:
+    """Runs the simulation with the peers split across worker processes
+
+    The occupancy grid and the position table live in shared memory, so
+    moves and range queries need no messages. The coordinator only runs the
+    round barrier and, optionally, traces the positions between rounds.
+
+    Args:
+        area_size (int): the length (in units) of the side of the simulation area
+        max_peers (int): the number of peers in the simulation
+        max_round (int): the maximum round the simulation will run
+        radio_range (int): WiFi range
+        workers (int): the number of worker processes (default: one per core)
+        seed (int): seeds the peers' moves, for reproducible runs
+        trace_path (str): if specified, the positions of every round are traced to this file
+        log_dir (str): the directory of the workers' logs
+
+    Returns:
+        (dict): the wall time, rounds, move counters and throughput of the run
+    """
+    workers = min(workers or os.cpu_count(), max_peers)
+    names: list[str] = list(generate_names(max_peers))
+    area: SharedArea = SharedArea.create(area_size, max_peers)
+    for peer_id, pos in enumerate(get_initial_positions(area_size, max_peers)):
+        area.place(peer_id, pos)
+
+    barrier = multiprocessing.Barrier(workers + 1)
+    stats = multiprocessing.Queue()
+    chunk: int = -(-max_peers // workers)
+    processes: list[multiprocessing.Process] = []
+    for worker in range(workers):
+        peer_ids: list[int] = list(range(worker * chunk, min((worker + 1) * chunk, max_peers)))
+        process = multiprocessing.Process(
+            target=run_worker,
+            args=(worker, peer_ids, names, area.get_spec(), barrier, max_round, radio_range, seed, log_dir, stats)
+        )
+        process.start()
+        processes.append(process)
+
+    trace: TraceWriter = TraceWriter(trace_path, names) if trace_path else None
+    start_time: float = time.perf_counter()
+    try:
+        for round in range(1, max_round):
+            barrier.wait()
+            if trace:
+                trace.append_round(round, area.positions)
+            print(f"From round {round} to {round + 1}")
+            barrier.wait()
+        wall_time: float = time.perf_counter() - start_time
+        counters = [stats.get() for _ in range(workers)]
+    except BrokenBarrierError:
+        for process in processes:
+            process.terminate()
+        raise RuntimeError("A worker process failed, see its traceback above")
+    finally:
+        for process in processes:
+            process.join()
+        if trace:
+            trace.close()
+        area.close()
+
+    moves: int = sum(counter[1] for counter in counters)
+    denied_moves: int = sum(counter[2] for counter in counters)
+    peer_rounds: int = max_peers * (max_round - 1)
+    return {
+        "wall_time": wall_time,
+        "rounds": max_round,
+        "workers": workers,
+        "moves": moves,
+        "denied_moves": denied_moves,
+        "mean_neighbors": sum(counter[3] for counter in counters) / peer_rounds if peer_rounds else 0,
+        "peer_rounds_per_second": peer_rounds / wall_time if wall_time else 0,
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    """Parses the command line arguments of a multi-process run"""
+    parser = argparse.ArgumentParser(description="Simulates the IPPS algorithm with peers split across processes")
+    parser.add_argument("--area-size", type=int, default=10)
+    parser.add_argument("--peers", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--radio-range", type=int, default=2)
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per core)")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--trace", help="trace the positions of every round to this file")
+    parser.add_argument("--log-dir", default=".")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = run_multiprocess_simulation(
+        args.area_size,
+        args.peers,
+        args.rounds,
+        args.radio_range,
+        workers=args.workers,
+        seed=args.seed,
+        trace_path=args.trace,
+        log_dir=args.log_dir
+    )
+    print(results)
@@ -0,0 +1,173 @@
+import logging
+import socket
+import threading
+import time
+import log
+from message import Message
+
+# titles that are not on the critical path of a round and may wait for the window
+LAZY_TITLES: frozenset[str] = frozenset({"SCAN", "PWIR"})
+
+
+class Outbox:
+    """Coalesces outgoing messages per destination into single writes
+
+    Lazy messages (see `LAZY_TITLES`) wait in the queue of their destination
+    for up to `window` seconds, or until the queue holds `byte_budget` bytes.
+    Any other message is urgent: it is sent at once, together with whatever
+    is already queued for the same destination, so the order of the messages
+    is kept. Every flush opens one connection and writes all its frames with
+    a single `sendall`.
+
+    Without a window the outbox sends every message at once over a connection
+    of its own and only counts them: this is the baseline the coalesced runs
+    are compared with.
+
+    A write that fails while a message is sent raises its OSError to the
+    sender. A write of the flushing thread that fails is logged instead.
+
+    Attributes:
+        logger (Logger): logs the writes of the flushing thread that failed
+        window (float): the longest a lazy message waits, in seconds, None
+        to send every message at once
+        byte_budget (int): the queued bytes that trigger a flush
+        lazy_titles (frozenset[str]): the titles of the messages that may wait
+        queues (dict[tuple[str, int], list[bytes]]): the frames waiting for each destination
+        queued_bytes (dict[tuple[str, int], int]): the size of each queue
+        deadlines (dict[tuple[str, int], float]): when each queue must be flushed
+        condition (Condition): guards the queues and wakes the flushing thread
+        active (bool): a flag that terminates the flushing thread
+        messages (int): the number of messages sent
+        writes (int): the number of writes (one connection each) used to send them
+        failures (int): the number of writes whose destination could not be reached
+        start_time (float): the perf_counter value the outbox was created at
+        flush_thread (Thread): the flushing thread, None without a window
+    """
+    logger: logging.Logger = logging.getLogger(log.LOGGER_NAME)
+
+    def __init__(self, window: float = 0.001, byte_budget: int = 16384, lazy_titles: frozenset[str] = LAZY_TITLES):
+        self.window: float = window
+        self.byte_budget: int = byte_budget
+        self.lazy_titles: frozenset[str] = lazy_titles
+        self.queues: dict[tuple[str, int], list[bytes]] = {}
+        self.queued_bytes: dict[tuple[str, int], int] = {}
+        self.deadlines: dict[tuple[str, int], float] = {}
+        self.condition: threading.Condition = threading.Condition()
+        self.active: bool = True
+        self.messages: int = 0
+        self.writes: int = 0
+        self.failures: int = 0
+        self.start_time: float = time.perf_counter()
+        self.flush_thread: threading.Thread = None
+        if window is not None:
+            self.flush_thread = threading.Thread(target=self.flush_expired, args=())
+            self.flush_thread.start()
+
+    def send(self, destination: tuple[str, int], message: Message, urgent: bool = None):
+        """Queues a message for a destination
+
+        Args:
+            destination (tuple[str, int]): the address of the recipient
+            message (Message): the message
+            urgent (bool): whether to send at once. By default, messages whose
+            title is not in lazy_titles are urgent. Without a window every
+            message is urgent
+
+        Raises:
+            OSError: if the destination could not be reached
+        """
+        if self.window is None:
+            urgent = True
+        elif urgent is None:
+            urgent = message.get_title() not in self.lazy_titles
+        frame: bytes = message.encode()
+        destination = tuple(destination)
+        frames: list[bytes] = None
+        with self.condition:
+            self.messages += 1
+            queue = self.queues.setdefault(destination, [])
+            queue.append(frame)
+            self.queued_bytes[destination] = self.queued_bytes.get(destination, 0) + len(frame)
+            if urgent or self.queued_bytes[destination] >= self.byte_budget:
+                frames = self.take(destination)
+            elif destination not in self.deadlines:
+                self.deadlines[destination] = time.perf_counter() + self.window
+                self.condition.notify()
+        if frames:
+            self.write(destination, frames)
+
+    def take(self, destination: tuple[str, int]) -> list[bytes]:
+        """Empties the queue of a destination. The condition must be held"""
+        self.deadlines.pop(destination, None)
+        self.queued_bytes.pop(destination, None)
+        return self.queues.pop(destination, [])
+
+    def write(self, destination: tuple[str, int], frames: list[bytes]):
+        """Sends the frames to a destination over a single connection
+
+        Raises:
+            OSError: if the destination could not be reached, once the failure is counted
+        """
+        try:
+            with socket.create_connection(destination) as client_socket:
+                client_socket.sendall(b"".join(frames))
+        except OSError:
+            with self.condition:
+                self.failures += 1
+            raise
+        finally:
+            with self.condition:
+                self.writes += 1
+
+    def flush_expired(self):
+        """Implements the flushing thread, which sends the queues whose window expired"""
+        while True:
+            with self.condition:
+                while self.active and not self.deadlines:
+                    self.condition.wait()
+                if not self.active:
+                    expired = list(self.queues)
+                else:
+                    now: float = time.perf_counter()
+                    next_deadline: float = min(self.deadlines.values())
+                    if next_deadline > now:
+                        self.condition.wait(next_deadline - now)
+                        continue
+                    expired = [destination for destination, deadline in self.deadlines.items() if deadline <= now]
+                batches = [(destination, self.take(destination)) for destination in expired]
+            for destination, frames in batches:
+                if not frames:
+                    continue
+                try:
+                    self.write(destination, frames)
+                except OSError as e:
+                    self.logger.error(
+                        f"Lost {len(frames)} messages to {destination}: {e}",
+                        extra={"peer_name": "Outbox", "round": "-"}
+                    )
+            if not self.active:
+                break
+
+    def close(self):
+        """Sends every queued message and stops the flushing thread"""
+        with self.condition:
+            self.active = False
+            self.condition.notify()
+        if self.flush_thread:
+            self.flush_thread.join()
+
+    def get_stats(self) -> dict:
+        """Returns the counters of the outbox
+
+        Every write costs three syscalls: connect, send and close. Without an
+        outbox every message is a write of its own.
+        """
+        elapsed: float = time.perf_counter() - self.start_time
+        return {
+            "messages": self.messages,
+            "writes": self.writes,
+            "syscalls": 3 * self.writes,
+            "messages_per_write": self.messages / self.writes if self.writes else 0.0,
+            "messages_per_second": self.messages / elapsed if elapsed else 0.0,
+            "failures": self.failures,
+        }
@@ -1,55 +1,109 @@
+import logging
 import socket
 import threading
+import time
 import log
 from threadpool import Threadpool
-from message import Message
+from message import Message, SERVER_ID
+from event_log import RECEIVED, SENT
+from profiler import TIMERS, timed
 
 class Peer:
     """Represents a mobile phone whose user moves randomly every round
 
+    Peers keep their state in `__slots__`, so that a simulation with many
+    peers does not pay for a dictionary per peer
+
     Attributes:
-        logger (Logger): logs all the actions of the peer
-        name (str): peer's name
+        logger (Logger): logs all the actions of the peers, shared by all of them
+        id (int): peer's id, its index in the bootstrap order
+        name (str): peer's name, used only for display
         pos (tuple[int, int]): peer's position
-        SOURCE_ADDRESS (tuple[str, int]): address the peers actively listens to
+        SOURCE_ADDRESS (tuple[str, int]): address the peers actively listens to. With
+        port 0, it is set to the bound address when the peer starts
         round (int): the round the peer is in
         END_ROUND (int): the round after which logging is disabled
-        DIRECTIONS (list[str]): the four possible cardinal direction the peer can move in
+        DIRECTIONS (tuple[str]): the four possible cardinal direction the peers can move in
         random_directions (list[str]): the subsets of possible directions the peer
         chose to make in a given round
         next_pos (tuple[int, int]): the position the peer chose to move next
         RADIO_RANGE (int): the WiFi range
-        peers_in_vicinity (list[str, tuple[int, str]]): the peers and their
-        addresses that are withing radio range
+        peers_in_vicinity (list[int, tuple[int, str]]): the ids and addresses
+        of the peers that are withing radio range
         threadpool (Threadpool): the simulation's threadpool
         serving_module_active (bool): a flag that controls the serving operation
         of the peer
+        serve_thread (Thread): the thread of the serving module
+        log_positions (bool): whether the position is logged every round. It is
+        disabled when the server traces positions
+        tracer (RoundTracer): if specified, records the phases of every round
+        outbox (Outbox): sends and counts the outgoing messages, coalescing them
+        if it has a window. A peer needs one to start
+        event_log (EventLogWriter): if specified, records every message the peer
+        sends or receives
     
     """
+    logger: logging.Logger = logging.getLogger(log.LOGGER_NAME)
+    DIRECTIONS: tuple[str] = ("up", "down", "left", "right")
+
+    __slots__ = (
+        "id",
+        "name",
+        "pos",
+        "SOURCE_ADDRESS",
+        "SERVER_ADDRESS",
+        "round",
+        "END_ROUND",
+        "random_directions",
+        "next_pos",
+        "RADIO_RANGE",
+        "peers_in_vicinity",
+        "threadpool",
+        "serving_module_active",
+        "serve_thread",
+        "log_positions",
+        "tracer",
+        "outbox",
+        "event_log",
+    )
+
     def __init__(
             self,
+            peer_id: int,
             name: str,
             pos: tuple[int, int],
             server_port: int,
             END_ROUND: int,
             server_address:tuple[str, int],
             radio_range: int,
-            threadpool: Threadpool
+            threadpool: Threadpool,
+            log_positions: bool = True,
+            tracer: "RoundTracer" = None,
+            outbox: "Outbox" = None,
+            event_log: "EventLogWriter" = None
             ):
-        self.logger = log.create_logger()
+        self.id: int = peer_id
         self.name: str = name
         self.pos: tuple[int, int] = pos
         self.SOURCE_ADDRESS: tuple[str, int] = ("127.0.0.1", server_port)
         self.SERVER_ADDRESS: tuple[str, int] = server_address
         self.round: int = 0
         self.END_ROUND: int = END_ROUND
-        self.DIRECTIONS: list[str] = ["up", "down", "left", "right"]
         self.random_directions: list[str] = []
         self.next_pos: tuple[int, int] = None
         self.RADIO_RANGE: int = radio_range
         self.peers_in_vicinity = []
         self.threadpool = threadpool
         self.serving_module_active: bool = True
+        self.serve_thread: threading.Thread = None
+        self.log_positions: bool = log_positions
+        self.tracer: "RoundTracer" = tracer
+        self.outbox: "Outbox" = outbox
+        self.event_log: "EventLogWriter" = event_log
+
+    def get_id(self) -> int:
+        """Returns the peer's id attribute"""
+        return self.id
 
     def get_name(self):
         """Returns the peer's name attribute"""
@@ -63,22 +117,54 @@ class Peer:
         """Returns the peers's SOURCE_ADDRESS attribute"""
         return self.SOURCE_ADDRESS
 
-    def log(self, message: str):
-        """Logs a peer's message"""
-        self.logger.info(message, extra={"peer_name": self.name, "round": self.round})
+    def get_move_state(self) -> tuple[tuple[int, int], list[str]]:
+        """Returns the peer's pending next_pos and remaining random directions"""
+        return self.next_pos, list(self.random_directions)
+
+    def restore_state(self, round: int, next_pos: tuple[int, int], random_directions: list[str]):
+        """Restores the round and pending move of the peer from a checkpoint"""
+        self.round = round
+        self.next_pos = next_pos
+        self.random_directions = random_directions
 
+    @timed("Peer.log")
+    def log(self, message: str, *args):
+        """Logs a peer's message, formatted with args only if it is written"""
+        self.logger.info(message, *args, extra={"peer_name": self.name, "round": self.round})
+
+    @timed("Peer.log")
     def log_pos(self):
         """Logs the peer's position"""
         self.logger.info("Position: (%s, %s)", self.pos[0], self.pos[1], extra={"peer_name": self.name, "round": self.round})
 
     def start(self):
-        """Enables the serving module of the peer"""
-        serve_thread = threading.Thread(target=self.serve, args=())
-        serve_thread.start()
+        """Binds the serving socket, enables the serving module of the peer and
+        tells the server that the peer is ready to receive messages
+
+        Raises:
+            ValueError: if the peer has no outbox to send its messages with
+        """
+        if self.outbox is None:
+            raise ValueError(f"{self.name} needs an outbox to send messages")
+        serve_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        serve_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        serve_socket.bind(self.SOURCE_ADDRESS)
+        # with port 0 the system picks a free port, which the READY message reports
+        self.SOURCE_ADDRESS = serve_socket.getsockname()
+        serve_socket.listen(3)
+        serve_socket.settimeout(2)
+        self.serve_thread = threading.Thread(target=self.serve, args=(serve_socket, ))
+        self.serve_thread.start()
+        ready_message = self.create_message("READY")
+        self.connect(self.SERVER_ADDRESS, "Server", ready_message)
+
+    def join(self):
+        """Waits for the serving module of the peer to terminate"""
+        self.serve_thread.join()
 
     def scan_peers(self):
         """Queries the server which servers are within radio range"""
-        scan_message = self.create_message("SCAN", f"{self.pos}|{self.RADIO_RANGE}")
+        scan_message = self.create_message("SCAN", (self.pos, self.RADIO_RANGE))
         self.log("Scanning for peers")
         self.connect(self.SERVER_ADDRESS, "Server", scan_message)
         
@@ -92,19 +178,14 @@ class Peer:
         message = Message(
             title=title,
             round=self.round,
-            name=self.name,
+            sender=self.id,
             source_address=self.SOURCE_ADDRESS,
             content=content
         )
 
         return message
 
-    def serve(self):
-        serve_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        serve_socket.bind(self.SOURCE_ADDRESS)
-        serve_socket.listen(3)
-        serve_socket.settimeout(2)
-        
+    def serve(self, serve_socket: socket.socket):
         while self.serving_module_active:
             try:
                 peer_socket, peer_address = serve_socket.accept()
@@ -118,15 +199,18 @@ class Peer:
 
     def receive(self, peer_socket:socket.socket, peer_address):
         peer_socket.settimeout(2)
+        buffer = b""
         while self.serving_module_active:
             try:
-                data = peer_socket.recv(1024)
+                data = peer_socket.recv(4096)
                 if not(data):
                     peer_socket.close()
                     # self.log(f"Closed connection with {peer_address}")
                     break
-                message: Message = Message.decode(data)
-                self.handle_message(message) 
+                frames, buffer = Message.split_frames(buffer + data)
+                for frame in frames:
+                    message: Message = Message.decode(frame)
+                    self.handle_message(message)
             except socket.timeout:
                 pass
      
@@ -141,18 +225,25 @@ class Peer:
         - PWIR (Peers WIthin Range): Shows which peers are withing radio range
         - TERM (TERMinate): Terminate the peer
         """
+        start: float = time.perf_counter() if TIMERS.enabled else None
         title = message.get_title()
-        peer_name = message.get_name()
-        self.log(f"Received {title} message from {peer_name}")
+        sender = message.get_sender()
+        peer_name = "Server" if sender == SERVER_ID else str(sender)
+        if self.tracer:
+            self.tracer.record(message.get_round(), self.name, title)
+        if self.event_log:
+            self.event_log.record(message.get_round(), self.id, title, RECEIVED, sender)
+        self.log("Received %s message from %s", title, peer_name)
         destination_address = message.get_source_address()
         content = message.get_content()
 
         if title == "PASR":
             self.round += 1
-            self.log_pos()
+            if self.log_positions:
+                self.log_pos()
 
             next_pos = self.select_move()
-            message = self.create_message("RQMV", f"{self.pos}|{next_pos}")
+            message = self.create_message("RQMV", (self.pos, next_pos))
             self.connect(destination_address, peer_name, message)
         elif title == "OKMV":
             self.pos = self.next_pos
@@ -163,19 +254,22 @@ class Peer:
         elif title == "DNMV":
             next_pos = self.select_move()
             if next_pos:
-                message = self.create_message("RQMV", f"{self.pos}|{next_pos}")
+                message = self.create_message("RQMV", (self.pos, next_pos))
             else:
                 message = self.create_message("FNMV")
                 self.scan_peers()
             self.connect(destination_address, peer_name, message)
         elif title == "PWIR":
             self.peers_in_vicinity = content
-            peers = list(map(lambda t: t[0], self.peers_in_vicinity))
-            self.log(f"Found: {peers} in vicinity")
+            peers = [peer_id for peer_id, _ in self.peers_in_vicinity]
+            self.log("Found: %s in vicinity", peers)
         elif title == "TERM":
             self.round += 1
             self.serving_module_active = False
             self.log("Terminating")
+
+        if start is not None:
+            TIMERS.add(f"Peer.handle_message[{title}]", start)
         
     def select_move(self):
         """Selects a random combination of moves each round and tries to execute
@@ -203,12 +297,12 @@ class Peer:
 
         else:
             self.next_pos = None
-            self.log(f"Request to move to {self.next_pos}")
+            self.log("Request to move to %s", self.next_pos)
 
         return self.next_pos
 
     def connect(self, destination: tuple[str, int], recipient: str, message: Message):
-        """Connect to the specific destination peer and deliver it a message
+        """Delivers a message to the specific destination through the outbox
         
         Args:
             destination (tuple[str, int]): the address of the receiving peer
@@ -216,20 +310,16 @@ class Peer:
             message (Message): the message to be sent
             
         """
-        peer_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        peer_socket.connect(destination)
-        # self.log(f"Open connection with {recipient}")
-        self.send(peer_socket, recipient, message)
-
-    def send(self, peer_socket: socket.socket, recipient: str, message: Message):
-        encoded_message = message.encode()
-        peer_socket.send(encoded_message)
-        self.log(f"Send {message.get_title()} message to {recipient}")
-        peer_socket.close()
-        # self.log(f"Closed connection with {recipient}")
+        if self.tracer:
+            self.tracer.record(message.get_round(), self.name, message.get_title())
+        if self.event_log:
+            # peers only exchange messages with the server
+            self.event_log.record(message.get_round(), self.id, message.get_title(), SENT, SERVER_ID)
+        self.outbox.send(destination, message)
+        self.log("Send %s message to %s", message.get_title(), recipient)
 
 
 if __name__ == "__main__":
     import random
     import time
-    peer = Peer("sf", (1, 2), 65433, 5)
\ No newline at end of file
+    peer = Peer(0, "sf", (1, 2), 65433, 5)
\ No newline at end of file
@@ -0,0 +1,153 @@
+import struct
+import sys
+from array import array
+from pathlib import Path
+from binary_file import MappedFile, align, encode_names, write_preamble
+
+MAGIC = b"IPPSTRCE"
+VERSION = 1
+# magic, version, num_peers, with_neighbors, names_bytes
+HEADER = struct.Struct("<8sIiiI")
+ROUND = struct.Struct("<i")
+POSITION = struct.Struct("<ii")
+
+
+def _data_offset(names_bytes: int) -> int:
+    """Returns the offset of the first round chunk, aligned to 8 bytes"""
+    return align(HEADER.size + names_bytes)
+
+
+def _chunk_size(num_peers: int, with_neighbors: bool) -> int:
+    """Returns the size in bytes of the chunk that holds one round
+
+    A chunk is the round number, padding, the x, y pairs of every peer and,
+    optionally, the neighbor count of every peer, all as int32
+    """
+    size: int = 8 + num_peers * 2 * 4
+    if with_neighbors:
+        size += num_peers * 4
+    return align(size)
+
+
+class TraceWriter:
+    """Appends the peers' positions of every round to a binary trace file
+
+    Every round is stored as a fixed-size chunk, so a reader can locate any
+    round or any peer by offset alone.
+
+    Attributes:
+        path (Path): the trace file
+        num_peers (int): the number of peers, fixed for the whole trace
+        with_neighbors (bool): whether the neighbor counts are stored as well
+        file (BufferedWriter): the open trace file
+    """
+    def __init__(self, path: str | Path, names: list[str], with_neighbors: bool = False):
+        self.path: Path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.num_peers: int = len(names)
+        self.with_neighbors: bool = with_neighbors
+        names_blob: bytes = encode_names(names)
+        self._chunk_size: int = _chunk_size(self.num_peers, with_neighbors)
+        self.file = open(self.path, "wb")
+        write_preamble(self.file, HEADER, MAGIC, VERSION, self.num_peers, with_neighbors, len(names_blob), names_blob=names_blob)
+
+    def append_round(self, round: int, positions: "Sequence[int]", neighbor_counts: "Sequence[int]" = None):
+        """Appends the positions (and neighbor counts) of a round
+
+        Args:
+            round (int): the round the positions belong to
+            positions (Sequence[int]): the x, y pairs of the position of every
+            peer, by peer id, e.g. the server's positions array
+            neighbor_counts (Sequence[int]): the number of peers found in range of every peer
+        """
+        chunk = bytearray(self._chunk_size)
+        ROUND.pack_into(chunk, 0, round)
+        coordinates = array("i", positions)
+        end: int = 8 + len(coordinates) * 4
+        chunk[8:end] = coordinates.tobytes()
+        if self.with_neighbors:
+            counts = array("i", neighbor_counts)
+            chunk[end:end + len(counts) * 4] = counts.tobytes()
+        self.file.write(chunk)
+
+    def close(self):
+        """Flushes and closes the trace file"""
+        self.file.close()
+
+
+class TraceReader(MappedFile):
+    """Memory-maps a trace file written by `TraceWriter`
+
+    `get_round` and `get_neighbor_counts` map one view per round and return
+    the same view on every call for that round. The views are released by
+    `close`, after which they can no longer be read.
+
+    Attributes:
+        num_peers (int): the number of peers in the trace
+        with_neighbors (bool): whether the trace holds neighbor counts
+        num_rounds (int): the number of rounds in the trace
+        first_round (int): the round of the first chunk
+    """
+    def __init__(self, path: str | Path):
+        super().__init__(path, "trace")
+        self.num_peers, with_neighbors, names_bytes = self._read_header(HEADER, MAGIC, VERSION)
+        self.with_neighbors: bool = bool(with_neighbors)
+        self._names_bytes: int = names_bytes
+        self._names: list[str] = None
+        self._round_views: dict[int, memoryview] = {}
+        self._neighbor_views: dict[int, memoryview] = {}
+        self._data_offset: int = _data_offset(names_bytes)
+        self._chunk_size: int = _chunk_size(self.num_peers, self.with_neighbors)
+        self.num_rounds: int = (len(self._mm) - self._data_offset) // self._chunk_size
+        self.first_round: int = ROUND.unpack_from(self._mm, self._data_offset)[0] if self.num_rounds else 0
+
+    def get_names(self) -> list[str]:
+        """Returns the peers' names, by peer index"""
+        if self._names is None:
+            self._names = self._read_names(HEADER.size, self._names_bytes)
+        return self._names
+
+    def _chunk_offset(self, round: int) -> int:
+        """Returns the offset of the chunk of a round"""
+        index: int = round - self.first_round
+        if not 0 <= index < self.num_rounds:
+            raise IndexError(f"Round {round} is not in the trace")
+        return self._data_offset + index * self._chunk_size
+
+    def get_round(self, round: int) -> memoryview:
+        """Returns the positions of a round as a flat x, y int32 memoryview"""
+        view: memoryview = self._round_views.get(round)
+        if view is None:
+            offset: int = self._chunk_offset(round) + 8
+            view = self._round_views[round] = self._section(offset, self.num_peers * 2 * 4, "i")
+        return view
+
+    def get_neighbor_counts(self, round: int) -> memoryview:
+        """Returns the neighbor counts of a round as an int32 memoryview"""
+        if not self.with_neighbors:
+            raise ValueError("The trace was written without neighbor counts")
+        view: memoryview = self._neighbor_views.get(round)
+        if view is None:
+            offset: int = self._chunk_offset(round) + 8 + self.num_peers * 2 * 4
+            view = self._neighbor_views[round] = self._section(offset, self.num_peers * 4, "i")
+        return view
+
+    def get_trajectory(self, peer_index: int) -> list[tuple[int, int]]:
+        """Returns the position of a peer in every round of the trace
+
+        Only the 8 bytes of the peer are read from each chunk
+        """
+        offset: int = self._data_offset + 8 + peer_index * POSITION.size
+        return [
+            POSITION.unpack_from(self._mm, offset + i * self._chunk_size)
+            for i in range(self.num_rounds)
+        ]
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "trace.bin"
+    with TraceReader(path) as reader:
+        names = reader.get_names()
+        print(f"{reader.num_peers} peers, rounds {reader.first_round}-{reader.first_round + reader.num_rounds - 1}")
+        for i, name in enumerate(names):
+            print(f"{name}: {reader.get_trajectory(i)}")
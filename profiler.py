@@ -0,0 +1,265 @@
+import cProfile
+import functools
+import io
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+# from Python 3.12 on, cProfile runs on sys.monitoring, which allows a single
+# active profiler per process. That profiler sees every thread
+SINGLE_PROFILER: bool = sys.version_info >= (3, 12)
+
+
+class HotPathTimers:
+    """Cheap always-on timers around the simulation's hot paths
+
+    Every thread accumulates into its own dictionary, so timing a call takes
+    no lock. The dictionaries are merged when a summary is requested. Runs
+    that cannot afford a timer per message, like the discrete-event engine,
+    may disable them.
+
+    Attributes:
+        enabled (bool): whether calls are recorded
+        local (local): the thread-local storage of the timers
+        registry (list[dict]): the timers of every thread that recorded a call
+        registry_lock (Lock): locks the registration of a new thread
+    """
+    def __init__(self):
+        self.enabled: bool = True
+        self.local = threading.local()
+        self.registry: list[dict[str, list]] = []
+        self.registry_lock: threading.Lock = threading.Lock()
+
+    def add(self, name: str, start: float):
+        """Records a call to `name` that started at `start` (a perf_counter value)"""
+        elapsed: float = time.perf_counter() - start
+        try:
+            timers = self.local.timers
+        except AttributeError:
+            timers = self.local.timers = {}
+            with self.registry_lock:
+                self.registry.append(timers)
+        entry = timers.get(name)
+        if entry is None:
+            timers[name] = [1, elapsed, elapsed]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+            if elapsed > entry[2]:
+                entry[2] = elapsed
+
+    def get_summary(self) -> dict[str, tuple[int, float, float]]:
+        """Returns the (calls, total seconds, max seconds) of every timer"""
+        summary: dict[str, list] = {}
+        with self.registry_lock:
+            registry = list(self.registry)
+        for timers in registry:
+            for name, (calls, total, longest) in list(timers.items()):
+                merged = summary.setdefault(name, [0, 0.0, 0.0])
+                merged[0] += calls
+                merged[1] += total
+                merged[2] = max(merged[2], longest)
+        return {name: tuple(entry) for name, entry in summary.items()}
+
+    def reset(self):
+        """Clears every timer"""
+        with self.registry_lock:
+            for timers in self.registry:
+                timers.clear()
+
+
+TIMERS = HotPathTimers()
+
+
+def timed(name: str) -> "function":
+    """Decorates a function so that every call is recorded in `TIMERS`"""
+    def decorator(func: "function") -> "function":
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not TIMERS.enabled:
+                return func(*args, **kwargs)
+            start: float = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                TIMERS.add(name, start)
+        return wrapper
+    return decorator
+
+
+class ThreadProfiler:
+    """Profiles every thread with cProfile and aggregates the results
+
+    Before Python 3.12, every thread started after `enable` gets its own
+    profiler through `threading.setprofile`, and the time of a thread is the
+    total of its profiler. From 3.12 on, the profiler of the calling thread
+    covers every thread, and the time of a thread is its CPU time, read from
+    its CPU clock whenever `sample` is called. The calling thread is profiled
+    as well.
+
+    Attributes:
+        profiles (list[tuple[str, Profile]]): the thread name and profiler of every profiled thread
+        lock (Lock): locks the registration of a new profiler
+        main_profile (Profile): the profiler of the thread that called `enable`
+        cpu_times (dict[str, float]): the latest CPU time of every thread, by name (3.12+)
+        base_cpu_times (dict[str, float]): the CPU time of the threads that ran before `enable`
+    """
+    def __init__(self):
+        self.profiles: list[tuple[str, cProfile.Profile]] = []
+        self.lock: threading.Lock = threading.Lock()
+        self.main_profile: cProfile.Profile = None
+        self.cpu_times: dict[str, float] = {}
+        self.base_cpu_times: dict[str, float] = {}
+
+    def register(self) -> cProfile.Profile:
+        """Creates a profiler for the current thread"""
+        profile = cProfile.Profile()
+        with self.lock:
+            self.profiles.append((threading.current_thread().name, profile))
+        return profile
+
+    def start_thread(self, frame, event, arg):
+        """Replaces the bootstrap profile hook of a new thread with its own profiler"""
+        sys.setprofile(None)
+        self.register().enable()
+
+    def enable(self):
+        """Starts profiling the current thread and every thread started afterwards"""
+        if not SINGLE_PROFILER:
+            threading.setprofile(self.start_thread)
+        self.sample()
+        self.base_cpu_times = dict(self.cpu_times)
+        self.main_profile = self.register()
+        self.main_profile.enable()
+
+    def disable(self):
+        """Stops profiling new threads and the current thread"""
+        self.sample()
+        if not SINGLE_PROFILER:
+            threading.setprofile(None)
+        self.main_profile.disable()
+
+    def sample(self):
+        """Reads the CPU clock of every running thread, if there is a single profiler"""
+        if not SINGLE_PROFILER or not hasattr(time, "pthread_getcpuclockid"):
+            return
+        for thread in threading.enumerate():
+            try:
+                clock: int = time.pthread_getcpuclockid(thread.ident)
+                self.cpu_times[thread.name] = time.clock_gettime(clock)
+            except OSError:
+                # the thread terminated after it was enumerated
+                pass
+
+    def get_stats(self) -> pstats.Stats:
+        """Returns the stats of every thread, aggregated"""
+        stats: pstats.Stats = None
+        with self.lock:
+            profiles = list(self.profiles)
+        for _, profile in profiles:
+            if stats is None:
+                stats = pstats.Stats(profile, stream=io.StringIO())
+            else:
+                stats.add(profile)
+        return stats
+
+    def get_thread_totals(self) -> list[tuple[str, float]]:
+        """Returns the total profiled time (CPU time from 3.12 on) of every thread, longest first"""
+        if SINGLE_PROFILER:
+            totals = [(name, cpu_time - self.base_cpu_times.get(name, 0.0)) for name, cpu_time in self.cpu_times.items()]
+            return sorted(totals, key=lambda t: t[1], reverse=True)
+        totals: list[tuple[str, float]] = []
+        with self.lock:
+            profiles = list(self.profiles)
+        for name, profile in profiles:
+            totals.append((name, pstats.Stats(profile, stream=io.StringIO()).total_tt))
+        return sorted(totals, key=lambda t: t[1], reverse=True)
+
+
+class Profiler:
+    """Collects the profiling data of a simulation run into a single report
+
+    Attributes:
+        report_path (Path): the file the report is written to
+        threads (ThreadProfiler): the per-thread cProfile profilers, if enabled
+        trace_memory (bool): whether a tracemalloc snapshot is taken every round
+        rounds (list[tuple]): the round, traced memory, peak memory and top
+        allocation differences of every round
+        start_time (float): the perf_counter value the run started at
+        elapsed (float): the duration of the run
+    """
+    def __init__(self, report_path: str = "profile_report.txt", cprofile: bool = True, trace_memory: bool = True, top: int = 25):
+        self.report_path: Path = Path(report_path)
+        self.threads: ThreadProfiler = ThreadProfiler() if cprofile else None
+        self.trace_memory: bool = trace_memory
+        self.top: int = top
+        self.rounds: list[tuple[int, int, int, list[str]]] = []
+        self.previous_snapshot: tracemalloc.Snapshot = None
+        self.start_time: float = None
+        self.elapsed: float = None
+
+    def start(self):
+        """Starts profiling"""
+        TIMERS.reset()
+        if self.trace_memory:
+            tracemalloc.start()
+            self.previous_snapshot = tracemalloc.take_snapshot()
+        if self.threads:
+            self.threads.enable()
+        self.start_time = time.perf_counter()
+
+    def on_round(self, round: int):
+        """Takes a memory snapshot and samples the thread clocks at the start of a round"""
+        if self.threads:
+            self.threads.sample()
+        if not self.trace_memory:
+            return
+        snapshot: tracemalloc.Snapshot = tracemalloc.take_snapshot()
+        differences = snapshot.compare_to(self.previous_snapshot, "lineno")[:5]
+        current, peak = tracemalloc.get_traced_memory()
+        self.rounds.append((round, current, peak, [str(difference) for difference in differences]))
+        self.previous_snapshot = snapshot
+
+    def stop(self):
+        """Stops profiling"""
+        self.elapsed = time.perf_counter() - self.start_time
+        if self.threads:
+            self.threads.disable()
+        if self.trace_memory:
+            tracemalloc.stop()
+
+    def write_report(self) -> Path:
+        """Writes the consolidated report of the run
+
+        Returns:
+            (Path): the path of the report
+        """
+        lines: list[str] = [f"Run time: {self.elapsed:.3f}s", "", "== Hot path timers =="]
+        lines.append(f"{'timer':<40}{'calls':>10}{'total (s)':>12}{'mean (us)':>12}{'max (ms)':>12}")
+        summary = sorted(TIMERS.get_summary().items(), key=lambda item: item[1][1], reverse=True)
+        for name, (calls, total, longest) in summary:
+            lines.append(f"{name:<40}{calls:>10}{total:>12.4f}{total / calls * 1e6:>12.1f}{longest * 1e3:>12.3f}")
+
+        if self.rounds:
+            lines += ["", "== Memory per round (tracemalloc) =="]
+            for round, current, peak, differences in self.rounds:
+                lines.append(f"Round {round}: current={current / 1024:.1f} KiB peak={peak / 1024:.1f} KiB")
+                lines += [f"    {difference}" for difference in differences]
+
+        if self.threads:
+            lines += ["", "== CPU time per thread ==" if SINGLE_PROFILER else "== Time per thread (cProfile) =="]
+            for name, total in self.threads.get_thread_totals():
+                lines.append(f"{name:<40}{total:>12.4f}s")
+            stats: pstats.Stats = self.threads.get_stats()
+            if stats:
+                stream = io.StringIO()
+                stats.stream = stream
+                stats.sort_stats("cumulative").print_stats(self.top)
+                lines += ["", "== Aggregated cProfile (all threads) ==", stream.getvalue()]
+
+        self.report_path.parent.mkdir(parents=True, exist_ok=True)
+        self.report_path.write_text("\n".join(lines))
+        return self.report_path
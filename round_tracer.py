@@ -0,0 +1,162 @@
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+SERVER = "Server"
+# the phase a segment of a peer's round is attributed to, by the event that ends it
+SEGMENT_PHASES: dict[str, str] = {
+    "PASR_SENT": "broadcast",
+    "PASR": "pool queueing",
+    "RQMV": "move selection",
+    "DNMV": "denied-move retries",
+    "OKMV": "move request",
+    "SCAN": "scan request",
+    "PWIR": "scan request",
+    "FNMV": "finish",
+    "FNMV_RECEIVED": "pool queueing",
+}
+
+
+class RoundTracer:
+    """Timestamps the phases every peer goes through in every round
+
+    Peers record the messages they receive (PASR, DNMV, OKMV, PWIR) and send
+    (RQMV, SCAN, FNMV). The server records the start of every round
+    (ROUND_START), every PASR it sends (PASR_SENT) and every FNMV it
+    receives (FNMV_RECEIVED).
+
+    Attributes:
+        events (list[tuple[float, int, str, str]]): the time, round, peer and event of every record
+        clock (function): returns the current time in seconds
+    """
+    def __init__(self, clock: "function" = time.perf_counter):
+        self.events: list[tuple[float, int, str, str]] = []
+        self.clock = clock
+
+    def record(self, round: int, peer_name: str, event: str):
+        """Records that a peer reached an event in a round"""
+        # list.append is atomic, so the threads do not need a lock
+        self.events.append((self.clock(), round, peer_name, event))
+
+    def get_timelines(self) -> dict[int, dict[str, list[tuple[float, str]]]]:
+        """Groups the events by round and peer, ordered by time"""
+        timelines: dict[int, dict[str, list[tuple[float, str]]]] = defaultdict(lambda: defaultdict(list))
+        for timestamp, round, peer_name, event in sorted(self.events):
+            timelines[round][peer_name].append((timestamp, event))
+        return timelines
+
+    def get_critical_paths(self) -> list[dict]:
+        """Computes the critical path of every complete round
+
+        The critical path of a round runs from its ROUND_START to the last
+        FNMV the server received. It is split into phases by the events of the
+        peer that sent that FNMV, the straggler.
+
+        Returns:
+            (list[dict]): the round, duration, straggler, number of denied moves
+            and time per phase of every round
+        """
+        critical_paths: list[dict] = []
+        for round, peers in sorted(self.get_timelines().items()):
+            if SERVER not in peers:
+                continue
+            round_start: float = peers[SERVER][0][0]
+            finishes = [
+                (timestamp, peer_name)
+                for peer_name, timeline in peers.items()
+                for timestamp, event in timeline
+                if event == "FNMV_RECEIVED"
+            ]
+            if not finishes:
+                continue
+            round_end, straggler = max(finishes)
+
+            # keep the straggler's events up to the end of the round
+            timeline: list[tuple[float, str]] = []
+            for timestamp, event in peers[straggler]:
+                if timestamp > round_end:
+                    break
+                timeline.append((timestamp, event))
+                if event == "FNMV_RECEIVED":
+                    break
+
+            phases: dict[str, float] = defaultdict(float)
+            previous_time, previous_event = round_start, "ROUND_START"
+            for timestamp, event in timeline:
+                if event in ("PWIR", "SCAN") and previous_event == "FNMV":
+                    # the scan after giving up on moving is not on the critical path
+                    continue
+                phase: str = SEGMENT_PHASES.get(event, event)
+                if previous_event == "DNMV":
+                    phase = "denied-move retries"
+                phases[phase] += timestamp - previous_time
+                previous_time, previous_event = timestamp, event
+
+            critical_paths.append({
+                "round": round,
+                "duration": round_end - round_start,
+                "straggler": straggler,
+                "denied_moves": sum(1 for _, event in timeline if event == "DNMV"),
+                "phases": dict(phases),
+            })
+        return critical_paths
+
+    def get_scan_latencies(self) -> list[float]:
+        """Returns the time between every SCAN and the PWIR that answered it"""
+        latencies: list[float] = []
+        for peers in self.get_timelines().values():
+            for peer_name, timeline in peers.items():
+                scan_time: float = None
+                for timestamp, event in timeline:
+                    if event == "SCAN":
+                        scan_time = timestamp
+                    elif event == "PWIR" and scan_time is not None:
+                        latencies.append(timestamp - scan_time)
+                        scan_time = None
+        return latencies
+
+    def format_report(self) -> str:
+        """Summarizes the critical paths, the stragglers and the dominant phases"""
+        critical_paths: list[dict] = self.get_critical_paths()
+        lines: list[str] = ["== Critical path per round =="]
+        for path in critical_paths:
+            phases: str = ", ".join(
+                f"{phase}={duration * 1e3:.2f}ms"
+                for phase, duration in sorted(path["phases"].items(), key=lambda item: item[1], reverse=True)
+            )
+            lines.append(
+                f"Round {path['round']}: {path['duration'] * 1e3:.2f}ms, straggler={path['straggler']}, "
+                f"denied_moves={path['denied_moves']} ({phases})"
+            )
+
+        stragglers = Counter(path["straggler"] for path in critical_paths)
+        lines += ["", "== Straggler frequency =="]
+        for peer_name, count in stragglers.most_common():
+            lines.append(f"{peer_name:<20}{count:>6} rounds")
+
+        dominant = Counter(max(path["phases"], key=path["phases"].get) for path in critical_paths if path["phases"])
+        totals: dict[str, float] = defaultdict(float)
+        for path in critical_paths:
+            for phase, duration in path["phases"].items():
+                totals[phase] += duration
+        total_time: float = sum(totals.values()) or 1
+        lines += ["", "== Phases on the critical path =="]
+        lines.append(f"{'phase':<24}{'dominant in':>12}{'total (ms)':>14}{'share':>8}")
+        for phase, duration in sorted(totals.items(), key=lambda item: item[1], reverse=True):
+            lines.append(f"{phase:<24}{dominant[phase]:>12}{duration * 1e3:>14.2f}{duration / total_time:>8.1%}")
+
+        latencies: list[float] = self.get_scan_latencies()
+        if latencies:
+            lines += ["", "== Scan latency (SCAN -> PWIR, all peers) =="]
+            lines.append(
+                f"scans={len(latencies)} mean={sum(latencies) / len(latencies) * 1e3:.2f}ms "
+                f"max={max(latencies) * 1e3:.2f}ms"
+            )
+        return "\n".join(lines)
+
+    def write_report(self, path: str | Path) -> Path:
+        """Writes the report of `format_report` into a file"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(self.format_report())
+        return path
@@ -1,93 +1,228 @@
+import logging
 import socket
 import threading
+import time
+from array import array
+from pathlib import Path
 import log
 import utils
+import checkpoint
+from position_trace import TraceWriter
 from threadpool import Threadpool
-from message import Message
+from acceptor import AcceptorGroup
+from grid import Grid, EMPTY
+from message import Message, SERVER_ID
+from event_log import RECEIVED, SENT
+from profiler import TIMERS, timed
 
 class Server:
     """Represents a central server that helps with position and connectivity betwween peers
+
+    Peers are known by their id, their index in the bootstrap order, so every
+    table of the server is an array indexed by id. Names are kept only for
+    display. The state is kept in `__slots__`.
     
     Attributes:
 
         name (str): the name of the server (just for logging purposes)
-        logger (Logger): logs all the actions of the peer
-        server_ADDRESS (tuple[str, int]): address the server actively listens to
-        peers_addresses (dict[str: tuple[str, int]]): a dictionary with all the
-        addresses
-        moved_peers (list[str]): tracks which peers have taken their move action
+        logger (Logger): logs all the actions of the server, shared with the peers
+        server_ADDRESS (tuple[str, int]): address the server actively listens to. With
+        port 0, it is set to the bound address when the server starts
+        names (list[str]): the name of every peer, by id
+        addresses (list[tuple[str, int]]): the address of every peer, by id, as
+        reported by its READY message
+        moved_peers (int): the number of peers that have taken their move action
         round (int): the round the server is in
         END_ROUND (int): the round after which logging is disabled
         MAX_PEERS (int): the number of peers in the simulation
         SIZE (int): the area's side size
-        area (list[list[int]]): a rectangle area where peers can move to
+        area (Grid): a rectangle area where peers can move to, holding the id
+        of the peer in each cell (row-major) or EMPTY, and the x, y pair of the
+        current position of every peer, by id, both as arrays
         lock (Lock): locks the area when a peer changes its pos
         threadpool (Threadpool): the simulation's threadpool
         serving_module_active (bool): a flag that controls the serving operation
         of the server
-        append_lock (Lock): locks the adding of a peer's name to the moved_peers list
+        append_lock (Lock): locks the counting of moved_peers and ready_peers
+        peers (list[Peer]): the bootstrapped peers, by id
+        checkpoint_rounds (set[int]): the rounds at the start of which a checkpoint is written
+        checkpoint_dir (Path): the directory checkpoints are written to
+        neighbor_counts (array[int]): the number of peers found by each peer's latest scan
+        trace_path (str): if specified, the file the positions of every round are traced to
+        trace_neighbors (bool): whether the neighbor counts are traced as well
+        trace (TraceWriter): the writer of the position trace
+        num_acceptors (int): the number of threads accepting connections
+        backlog (int): the accept queue length of the serving sockets
+        acceptors (AcceptorGroup): the front end that accepts connections
+        serve_thread (Thread): the thread of the serving module
+        profiler (Profiler): if specified, notified at the start of every round
+        tracer (RoundTracer): if specified, records the start of every round and
+        the PASR and FNMV messages of every peer
+        outbox (Outbox): sends and counts the outgoing messages, coalescing them
+        if it has a window. A server needs one to start
+        ready_peers (int): the number of peers that have sent a READY message
+        all_ready (Event): set once every peer is ready
+        ready_timeout (float): the longest the bootstrap waits for the peers, in seconds
+        event_log (EventLogWriter): if specified, records every message the server
+        sends or receives
         """
-    def __init__(self, port: int, size: int, max_peers: int, END_ROUND: int, threadpool: Threadpool):
+    logger: logging.Logger = logging.getLogger(log.LOGGER_NAME)
+
+    __slots__ = (
+        "name",
+        "SERVER_ADDRESS",
+        "names",
+        "addresses",
+        "moved_peers",
+        "round",
+        "END_ROUND",
+        "MAX_PEERS",
+        "SIZE",
+        "area",
+        "lock",
+        "threadpool",
+        "serving_module_active",
+        "append_lock",
+        "peers",
+        "checkpoint_rounds",
+        "checkpoint_dir",
+        "neighbor_counts",
+        "trace_path",
+        "trace_neighbors",
+        "trace",
+        "num_acceptors",
+        "backlog",
+        "acceptors",
+        "serve_thread",
+        "profiler",
+        "tracer",
+        "outbox",
+        "ready_peers",
+        "all_ready",
+        "ready_timeout",
+        "event_log",
+    )
+
+    def __init__(
+            self,
+            port: int,
+            size: int,
+            max_peers: int,
+            END_ROUND: int,
+            threadpool: Threadpool,
+            checkpoint_rounds: "Iterable[int]" = (),
+            checkpoint_dir: str = "checkpoints",
+            trace_path: str = None,
+            trace_neighbors: bool = False,
+            num_acceptors: int = 1,
+            backlog: int = 5,
+            ready_timeout: float = 60.0,
+            profiler: "Profiler" = None,
+            tracer: "RoundTracer" = None,
+            outbox: "Outbox" = None,
+            event_log: "EventLogWriter" = None
+            ):
+        log.create_logger()
         self.name = "Server"
-        self.logger = log.create_logger()
         self.SERVER_ADDRESS = ("127.0.0.1", port)
-        self.peers_addresses: dict[str: tuple[str, int]] = {}
-        self.moved_peers: list[str] = []
+        self.names: list[str] = []
+        self.addresses: list[tuple[str, int]] = [None] * max_peers
+        self.moved_peers: int = 0
         self.round: int = 1
         self.END_ROUND: int = END_ROUND
         self.MAX_PEERS: int = max_peers
         self.SIZE: int = size
-        self.area: list[list[str]] = [["#" for _ in range(size)] for _ in range(size)]
         self.lock: threading.Lock = threading.Lock()
+        self.area: Grid = Grid(size, array("i", [EMPTY]) * (size * size), array("i"), [self.lock])
         self.threadpool = threadpool
         self.serving_module_active: bool = True
         self.append_lock: threading.Lock = threading.Lock()
+        self.peers: list["Peer"] = []
+        self.checkpoint_rounds: set[int] = set(checkpoint_rounds)
+        self.checkpoint_dir: Path = Path(checkpoint_dir)
+        self.neighbor_counts: array = array("i")
+        self.trace_path: str = trace_path
+        self.trace_neighbors: bool = trace_neighbors
+        self.trace: TraceWriter = None
+        self.num_acceptors: int = num_acceptors
+        self.backlog: int = backlog
+        self.acceptors: AcceptorGroup = None
+        self.serve_thread: threading.Thread = None
+        self.profiler: "Profiler" = profiler
+        self.tracer: "RoundTracer" = tracer
+        self.outbox: "Outbox" = outbox
+        self.ready_peers: int = 0
+        self.all_ready: threading.Event = threading.Event()
+        self.ready_timeout: float = ready_timeout
+        self.event_log: "EventLogWriter" = event_log
 
     def get_round(self):
         """Return the current round the server is in"""
         return self.round
 
-    def get_peer_address(self, peer_name: str) -> str:
+    def get_peer_address(self, peer_id: int) -> tuple[str, int]:
         """Returns the peer's address"""
-        return self.peers_addresses[peer_name]
-    
-    def update_peers_addresses(self, peer_name: str, peer_address: tuple[str, int]):
-        """Adds a new peer to the peers_addresses"""
-        self.peers_addresses[peer_name] = peer_address
+        return self.addresses[peer_id]
+
+    def get_peer_name(self, peer_id: int) -> str:
+        """Returns the peer's name, or its id if it is not bootstrapped yet"""
+        if peer_id < len(self.names):
+            return self.names[peer_id]
+        return str(peer_id)
 
-    def log(self, message):
-        """Logs a server's message"""
-        self.logger.info(message, extra={"peer_name": self.name, "round": self.round})
+    @timed("Server.log")
+    def log(self, message, *args):
+        """Logs a server's message, formatted with args only if it is written"""
+        self.logger.info(message, *args, extra={"peer_name": self.name, "round": self.round})
 
+    @timed("Server.log")
     def log_important(self, message):
         """Logs a server's important message"""
         self.logger.info(f"\x1b[31m{message}\x1b[0m", extra={"peer_name": self.name, "round": self.round})
 
+    def get_accept_stats(self) -> dict:
+        """Returns the accept counters of the serving module"""
+        return self.acceptors.get_stats()
+
     def start(self):
-        """Enables the serving module of the server"""
-        threading.Thread(target=self.serve, args=()).start()
+        """Binds the serving sockets and enables the serving module of the server
+
+        Raises:
+            ValueError: if the server has no outbox to send its messages with
+        """
+        if self.outbox is None:
+            raise ValueError("The server needs an outbox to send messages")
+        self.acceptors = AcceptorGroup(
+            self.SERVER_ADDRESS,
+            self.accept,
+            lambda: self.serving_module_active,
+            self.num_acceptors,
+            self.backlog
+        )
+        self.acceptors.start()
+        # with port 0 the system picks a free port, which every message of the server reports
+        self.SERVER_ADDRESS = self.acceptors.address
+        self.serve_thread = threading.Thread(target=self.serve, args=())
+        self.serve_thread.start()
+
+    def join(self):
+        """Waits for the serving module of the server to terminate"""
+        self.serve_thread.join()
 
     def serve(self):
-        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        server_socket.bind(self.SERVER_ADDRESS)
-        server_socket.listen(5)
-        server_socket.settimeout(2)
-        
-        while self.serving_module_active:
-            try:
-                client_socket, client_address = server_socket.accept()
-                # self.log(f"Opened connection with {client_address}")
-                self.threadpool.add_task(self.receive, args=(client_socket, client_address, ))
-            except socket.timeout:
-                pass
-        server_socket.close()
-        self.log_important("Serving module terminated")
+        self.acceptors.join()
+        self.log_important(f"Serving module terminated: {self.get_accept_stats()}")
+
+    def accept(self, client_socket: socket.socket, client_address: str):
+        """Hands an accepted connection to the threadpool"""
+        # self.log(f"Opened connection with {client_address}")
+        self.threadpool.add_task(self.receive, args=(client_socket, client_address, ))
 
     def create_message(self, title: str, content=""):
         message = Message(
             title=title,
             round=self.round,
-            name=self.name,
+            sender=SERVER_ID,
             source_address=self.SERVER_ADDRESS,
             content=content
         )
@@ -96,15 +231,18 @@ class Server:
 
     def receive(self, client_socket: socket.socket, client_address: str):
         client_socket.settimeout(2)
+        buffer = b""
         while self.serving_module_active:
             try:
-                data = client_socket.recv(1024)
+                data = client_socket.recv(4096)
                 if not(data):
                     client_socket.close()
                     # self.log(f"Closed address with {client_address}")
                     break
-                message = Message.decode(data)
-                self.handle_message(message)
+                frames, buffer = Message.split_frames(buffer + data)
+                for frame in frames:
+                    message: Message = Message.decode(frame)
+                    self.handle_message(message)
             except socket.timeout:
                 pass
 
@@ -114,12 +252,20 @@ class Server:
         - RQMV (ReQuest MoVe): Peer is requesting to move to a new pos.
         - FNMV (Finish MoVe): Peer is signaling that has finished moving for the round
         - SCAN (SCAN peers): Peer is requesting which peers are withing its radio range
+        - READY: Peer has bound its serving socket and can receive messages at
+        the source address of the message
+
+        Messages name their sender by id
        
         """
+        start: float = time.perf_counter() if TIMERS.enabled else None
         title = message.get_title()
-        peer_name = message.get_name()
-        self.log(f"Received {title} message from {peer_name}")
+        peer_id = message.get_sender()
+        peer_name = self.get_peer_name(peer_id)
+        self.log("Received %s message from %s", title, peer_name)
         round = message.get_round()
+        if self.event_log:
+            self.event_log.record(round, SERVER_ID, title, RECEIVED, peer_id)
         destination = message.get_source_address()
         content = message.get_content()
 
@@ -127,67 +273,52 @@ class Server:
             self.log_important(f"{peer_name} IS AHEAD IN TIME CYCLES")
         
         if title == "RQMV":
-            current_pos_str, new_pos_str = content.split("|")
-            current_pos = utils.string_to_tuple(current_pos_str)
-            new_pos = utils.string_to_tuple(new_pos_str)
-            valid_move = self.change_pos(peer_name, current_pos, new_pos)
+            current_pos, new_pos = content
+            valid_move = self.change_pos(peer_id, current_pos, new_pos)
             if valid_move:
                 accept_move_message = self.create_message("OKMV")
-                self.connect(peer_name, accept_move_message, destination)
+                self.connect(peer_id, accept_move_message, destination)
             else:
                 deny_move_message = self.create_message("DNMV")
-                self.connect(peer_name, deny_move_message, destination)
+                self.connect(peer_id, deny_move_message, destination)
         elif title == "FNMV":
+            if self.tracer:
+                self.tracer.record(round, peer_name, "FNMV_RECEIVED")
             with self.append_lock:
-                self.moved_peers.append(peer_name)
-                if len(self.moved_peers) == self.MAX_PEERS:
+                self.moved_peers += 1
+                if self.moved_peers == self.MAX_PEERS:
                     self.threadpool.add_task(self.start_new_round)
         elif title == "SCAN":
-            peer_pos_str, radio_range_str = content.split("|")
-            peer_pos = utils.string_to_tuple(peer_pos_str)
-            radio_range = int(radio_range_str)
-
+            peer_pos, radio_range = content
             peers_in_vicinity = self.find_peers(peer_pos, radio_range)
+            self.neighbor_counts[peer_id] = len(peers_in_vicinity)
             peers_in_vicinity_message = self.create_message("PWIR", peers_in_vicinity)
-            self.connect(peer_name, peers_in_vicinity_message, destination)
+            self.connect(peer_id, peers_in_vicinity_message, destination)
+        elif title == "READY":
+            with self.append_lock:
+                self.addresses[peer_id] = destination
+                self.ready_peers += 1
+                if self.ready_peers == self.MAX_PEERS:
+                    self.all_ready.set()
+
+        if start is not None:
+            TIMERS.add(f"Server.handle_message[{title}]", start)
     
+    @timed("Server.find_peers")
     def find_peers(self, peer_pos: tuple[str, int], radio_range: int):
-        """Finds the peers that are withing range of the requesting peer"""
-        peers_in_vicinity: list[tuple[str, tuple[str, int]]] = []
-        x_cardinals = [peer_pos[0]]
-        y_cardinals = [peer_pos[1]]
-
-        for r in range(1, radio_range + 1):
-            right = peer_pos[0] + r
-            if right in range(self.SIZE):
-                x_cardinals.append(right)
-            
-            left = peer_pos[0] - r
-            if left in range(self.SIZE):
-                x_cardinals.append(left)
-            
-            down = peer_pos[1] + r
-            if down in range(self.SIZE):
-                y_cardinals.append(down)
-            
-            up = peer_pos[1] - r
-            if up in range(self.SIZE):
-                y_cardinals.append(up)
-
-        with self.lock:
-            for x in x_cardinals:
-                for y in y_cardinals:
-                    if self.area[x][y] != "#" and not (x == peer_pos[0] and y == peer_pos[1]):
-                        peer_name = self.area[x][y]
-                        self.log(f"Found {peer_name} at {x},{y}")
-                        peer_address = self.peers_addresses[peer_name]
-                        peers_in_vicinity.append((peer_name, peer_address))
+        """Finds the ids and addresses of the peers that are withing range of the requesting peer"""
+        positions = self.area.positions
+        peers_in_vicinity: list[tuple[int, tuple[str, int]]] = []
+        for peer_id in self.area.find_peers(peer_pos, radio_range):
+            self.log("Found %s at %s,%s", self.names[peer_id], positions[2 * peer_id], positions[2 * peer_id + 1])
+            peers_in_vicinity.append((peer_id, self.addresses[peer_id]))
 
         return peers_in_vicinity
 
+    @timed("Server.change_pos")
     def change_pos(
             self,
-            peer_name: str,
+            peer_id: int,
             current_pos: tuple[int, int],
             new_pos: tuple[int, int],
             ):
@@ -197,98 +328,165 @@ class Server:
         Otherwise it returns False
 
         """
-        self.log(f"{peer_name} wants to change their position to {new_pos} ")
-        valid_move = False
-        x, y = new_pos
-        if x in range(0, self.SIZE) and y in range(0, self.SIZE):
-            with self.lock:
-                if self.area[x][y] == "#":
-                    valid_move = True
-
-        if valid_move:
-            with self.lock:
-                #remove the current_pos 
-                self.area[current_pos[0]][current_pos[1]] = "#"
-                # note the new pos
-                self.area[x][y] = peer_name
-            
-            return True
-        
-        return False
+        self.log("%s wants to change their position to %s ", self.names[peer_id], new_pos)
+        return self.area.change_pos(peer_id, current_pos, new_pos)
 
     def start_new_round(self):
         """Starts a new round and broadcasts a PASR message to all peers. If
         it is the last round, it broadcasts a TERM message instead"""
         print(f"From round {self.round} to {self.round + 1}")
+        if self.trace:
+            self.trace.append_round(self.round, self.area.positions, self.neighbor_counts)
         
         self.round += 1
+        if self.profiler:
+            self.profiler.on_round(self.round)
         if self.round < self.END_ROUND:
             self.log_important("New Time Cycle")
-            # after the broadcast, clear the list of moved peers
-            self.moved_peers.clear()
+            # after the broadcast, reset the count of moved peers
+            self.moved_peers = 0
+            if self.round in self.checkpoint_rounds:
+                self.save_checkpoint()
             message = self.create_message("PASR")
+            if self.tracer:
+                self.tracer.record(self.round, self.name, "ROUND_START")
             # send the broadcast message
             self.broadcast(message)
         else:
             self.log_important("Terminating")
-            # wait for scan attempts to terminate
-            import time
-            time.sleep(2)
+            self.wait_for_scans()
             message = self.create_message("TERM")
             self.broadcast(message)
             self.serving_module_active = False
+            if self.trace:
+                self.trace.close()
+
+    def wait_for_scans(self):
+        """Waits for the scan attempts of the last round to terminate"""
+        time.sleep(2)
 
     def broadcast(self, message: Message):
         """Broadcasts a message to all peers"""
         self.log("Sending broadcast")
-        for peer_name, address in self.peers_addresses.items():
-            self.connect(peer_name, message, address)
+        for peer_id, address in enumerate(self.addresses):
+            self.connect(peer_id, message, address)
         
-    def connect(self, peer_name: str, message: Message, destination: tuple[str, int]):
-        """Connects with a specific peer and deliver it a message"""
-        client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        client_socket.connect(destination)
-        # self.log(f"Opened connection with {peer_name}")
-        self.send(peer_name, client_socket, message)
-
-    def send(self, peer_name, client_socket: socket.socket, message: Message):
-        encoded_message = message.encode()
-        client_socket.send(encoded_message)
-        self.log(f"Send {message.get_title()} message to {peer_name}")
-
-        client_socket.close()
-        self.log(f"Closed connection with {peer_name}")
+    def connect(self, peer_id: int, message: Message, destination: tuple[str, int]):
+        """Delivers a message to a specific peer through the outbox"""
+        peer_name = self.names[peer_id]
+        if self.tracer and message.get_title() == "PASR":
+            self.tracer.record(message.get_round(), peer_name, "PASR_SENT")
+        if self.event_log:
+            self.event_log.record(message.get_round(), SERVER_ID, message.get_title(), SENT, peer_id)
+        self.outbox.send(destination, message)
+        self.log("Send %s message to %s", message.get_title(), peer_name)
+
+    def save_checkpoint(self) -> Path:
+        """Writes a checkpoint of the simulation at the start of the current round
+
+        Must be called between rounds, when every peer has finished moving
+
+        Returns:
+            (Path): the path of the checkpoint file
+        """
+        path: Path = self.checkpoint_dir.joinpath(f"round_{self.round}.ckpt")
+        checkpoint.write_checkpoint(path, self, self.peers)
+        self.log_important(f"Checkpoint written to {path}")
+        return path
+
+    def restore_checkpoint(self, ckpt: checkpoint.Checkpoint):
+        """Restores the round and the area from a checkpoint"""
+        self.round = ckpt.round
+        # the grid of a checkpoint holds the ids of the peers, like the area
+        self.area.grid = array("i", ckpt.grid)
+
+    def register_peers(self, peers: list["Peer"]):
+        """Fills the tables of the server with the ids, names and positions of the peers
+
+        The addresses are filled by the READY messages of the peers
+
+        Raises:
+            ValueError: if the ids of the peers are not their indices in peers
+        """
+        self.peers = peers
+        self.names = [peer.get_name() for peer in peers]
+        self.area.positions = array("i", bytes(len(peers) * 2 * 4))
+        self.neighbor_counts = array("i", bytes(len(peers) * 4))
+        for peer_id, peer in enumerate(peers):
+            if peer.get_id() != peer_id:
+                raise ValueError(f"{peer.get_name()} has id {peer.get_id()} but is bootstrapped as {peer_id}")
+            self.area.place(peer_id, peer.get_pos())
 
     def bootstrap(self, peers: list["Peer"]):
         """Updates the peers positions, addresses and starts a broadcast"""
-        for peer in peers:
-
-            peer_name = peer.get_name()
-            peer_address = peer.get_source_address()
-            self.update_peers_addresses(peer_name, peer_address)
+        self.register_peers(peers)
 
-            peer_pos = peer.get_pos()
-            self.area[peer_pos[0]][peer_pos[1]] = peer_name
+        if self.trace_path:
+            self.trace = TraceWriter(self.trace_path, self.names, self.trace_neighbors)
 
+        self.wait_for_peers()
         message = self.create_message("PASR")
+        if self.tracer:
+            self.tracer.record(self.round, self.name, "ROUND_START")
         self.broadcast(message)
 
+    def wait_for_peers(self):
+        """Waits until every peer has sent a READY message
+
+        Raises:
+            TimeoutError: if the peers are not ready within ready_timeout seconds
+        """
+        if not self.all_ready.wait(self.ready_timeout):
+            raise TimeoutError(
+                f"Only {self.ready_peers} of {self.MAX_PEERS} peers were ready after {self.ready_timeout}s"
+            )
+        self.log_important(f"All {self.MAX_PEERS} peers are ready")
+
 
 if __name__ == "__main__":
-    server = Server(65432, 3, 2, 5)
-    server.peers_addresses = {
-        "A": 1,
-        "B": 2,
-        "C": 3,
-        "D": 4,
-        "E": 5
-    }
-
-    server.area = [
-        ["A", "#", "E"],
-        ["#", "B", "#"],
-        ["C", "D", "E"]
+    # measures the memory per peer and the lookup cost of the server's tables
+    import random
+    import tracemalloc
+    from peer import Peer
+
+    NUM_PEERS = 100_000
+    AREA_SIZE = 1000
+    LOOKUPS = 10_000
+    RADIO_RANGE = 2
+
+    server = Server(0, AREA_SIZE, NUM_PEERS, 2, None)
+    server.logger.disabled = True
+    positions = utils.get_initial_positions(AREA_SIZE, NUM_PEERS)
+    names = list(utils.generate_names(NUM_PEERS))
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    peers = [
+        Peer(peer_id, names[peer_id], positions[peer_id], 1024 + peer_id % 60000, 2, server.SERVER_ADDRESS, RADIO_RANGE, None)
+        for peer_id in range(NUM_PEERS)
     ]
-
-    print(server.find_peers((0, 0), 2))
\ No newline at end of file
+    after_peers = tracemalloc.get_traced_memory()[0]
+    server.register_peers(peers)
+    server.addresses = [peer.get_source_address() for peer in peers]
+    after_server = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"Peer objects: {(after_peers - before) / NUM_PEERS:.1f} bytes per peer")
+    print(f"Server tables: {(after_server - after_peers) / NUM_PEERS:.1f} bytes per peer")
+    print(f"Area: {server.area.grid.itemsize * len(server.area.grid) / 2 ** 20:.1f} MiB for {AREA_SIZE}x{AREA_SIZE} cells")
+
+    sample = random.sample(range(NUM_PEERS), LOOKUPS)
+    start = time.perf_counter()
+    for peer_id in sample:
+        server.get_peer_address(peer_id)
+    print(f"Address lookup: {(time.perf_counter() - start) / LOOKUPS * 1e9:.0f} ns")
+
+    start = time.perf_counter()
+    for peer_id in sample:
+        server.find_peers(positions[peer_id], RADIO_RANGE)
+    print(f"find_peers (range {RADIO_RANGE}): {(time.perf_counter() - start) / LOOKUPS * 1e6:.1f} us")
+
+    start = time.perf_counter()
+    for peer_id in sample:
+        x, y = server.area.get_pos(peer_id)
+        server.change_pos(peer_id, (x, y), (x, y + 1))
+    print(f"change_pos: {(time.perf_counter() - start) / LOOKUPS * 1e6:.1f} us")
@@ -0,0 +1,69 @@
+import multiprocessing
+from multiprocessing import shared_memory
+from grid import Grid
+
+
+class SharedArea(Grid):
+    """A `Grid` whose grid and position table live in shared memory
+
+    Both are int32 buffers that every process maps without copying, and moves
+    are committed under locks that every process shares.
+
+    Attributes:
+        num_peers (int): the number of peers
+        grid_memory (SharedMemory): the memory of the grid
+        positions_memory (SharedMemory): the memory of the position table
+        owner (bool): whether this process created the memory and must unlink it
+    """
+    __slots__ = ("num_peers", "grid_memory", "positions_memory", "owner")
+
+    def __init__(
+            self,
+            size: int,
+            num_peers: int,
+            locks: list["Lock"],
+            grid_name: str = None,
+            positions_name: str = None
+            ):
+        self.num_peers: int = num_peers
+        self.owner: bool = grid_name is None
+        if self.owner:
+            self.grid_memory = shared_memory.SharedMemory(create=True, size=size * size * 4)
+            self.positions_memory = shared_memory.SharedMemory(create=True, size=max(num_peers, 1) * 2 * 4)
+        else:
+            self.grid_memory = shared_memory.SharedMemory(name=grid_name)
+            self.positions_memory = shared_memory.SharedMemory(name=positions_name)
+        super().__init__(
+            size,
+            self.grid_memory.buf[:size * size * 4].cast("i"),
+            self.positions_memory.buf[:num_peers * 2 * 4].cast("i"),
+            locks
+        )
+        if self.owner:
+            # every byte of an EMPTY int32 is 0xff
+            self.grid_memory.buf[:size * size * 4] = b"\xff" * (size * size * 4)
+
+    @classmethod
+    def create(cls, size: int, num_peers: int, num_locks: int = 64) -> "SharedArea":
+        """Allocates a new, empty area in shared memory"""
+        locks = [multiprocessing.Lock() for _ in range(num_locks)]
+        return cls(size, num_peers, locks)
+
+    def get_spec(self) -> tuple:
+        """Returns what another process needs to attach to the area"""
+        return (self.SIZE, self.num_peers, self.locks, self.grid_memory.name, self.positions_memory.name)
+
+    @classmethod
+    def attach(cls, spec: tuple) -> "SharedArea":
+        """Maps an area created by another process, see `get_spec`"""
+        return cls(*spec)
+
+    def close(self):
+        """Unmaps the area, and frees it if this process created it"""
+        self.grid.release()
+        self.positions.release()
+        self.grid_memory.close()
+        self.positions_memory.close()
+        if self.owner:
+            self.grid_memory.unlink()
+            self.positions_memory.unlink()
@@ -1,49 +1,128 @@
 from server import Server
 from peer import Peer
-from pathlib import Path
 from threadpool import Threadpool
+import checkpoint
+from profiler import Profiler, TIMERS
+from round_tracer import RoundTracer
+from outbox import Outbox
+from event_log import EventLogWriter
+from utils import generate_names, get_initial_positions
+import argparse
+import log
+import random
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-def get_names() -> "generator":
-    """Creates a generator that yields names from `random_names.txt` file
-    
-    Yields:
-        (str): a name from the `random_names.txt` file
-    
+def start_peers(peers: list[Peer], startup_threads: int = 32):
+    """Activates the serving module of the peers concurrently
+
+    Binding a socket is a syscall that does not need the GIL, so the peers are
+    started by a pool of threads instead of one after the other. If any peer
+    fails to start, the ones that did are stopped and the error is raised.
     """
-    filepath: Path = Path(__file__).parent.joinpath("random_names.txt")
-    with open(filepath, "r") as file:
-        names: list[str] = file.readlines()
-        for name in names:
-            name = name.strip()
-            yield name
-
-def initialize_peers(max_peers: int, max_rounds: int, server_address: tuple[str, int], radio_range: int, threads: int) -> list[Peer]:
+    try:
+        with ThreadPoolExecutor(max_workers=max(min(startup_threads, len(peers)), 1)) as executor:
+            list(executor.map(Peer.start, peers))
+    except Exception:
+        for peer in peers:
+            peer.serving_module_active = False
+        raise
+
+def initialize_peers(area_size: int, max_peers: int, max_rounds: int, server_address: tuple[str, int], radio_range: int, threads: int, base_port: int = None, **peer_kwargs) -> list[Peer]:
     """Initiates peers, activates their serving module and main behavior
     
-    Sets the initial positional of peers along the diagonal of the area
-    Sets their ports from 61001 and onwards
+    Sets the initial positional of peers along the diagonal of the area, or
+    spreads them over the area if the diagonal is too short
+    Sets their ports from base_port and onwards, or lets every peer bind any
+    free port if base_port is None
 
     Args:
+        area_size (int): the length (in units) of the side of the simulation area
         max_peers (int): the maximum number of peers that will appear in the simulation
         max_rounds (int): the maximum rounds the simulation will run
         server_address (tuple[str, int]): the server's address and port
         radio_range (int): WiFi range
+        base_port (int): the port of the first peer
+        peer_kwargs: passed to every `Peer`, e.g. tracer or event_log
 
     Returns:
         (list[Peer]): the list of initiated peers
     """
-    random_names_generator: "generator" = get_names()
+    positions: list[tuple[int, int]] = get_initial_positions(area_size, max_peers)
+    peers = [
+        Peer(i, name, positions[i], base_port + i if base_port else 0, max_rounds, server_address, radio_range, threads, **peer_kwargs)
+        for i, name in enumerate(generate_names(max_peers))
+    ]
+    start_peers(peers)
+    return peers
+
+
+def restore_peers(ckpt: checkpoint.Checkpoint, max_rounds: int, server_address: tuple[str, int], radio_range: int, threads: int, base_port: int = None, **peer_kwargs) -> list[Peer]:
+    """Recreates the peers of a checkpoint and activates their serving module
+
+    Peers keep the names, positions and pending moves they had when the
+    checkpoint was taken. Their round is set one behind the server's, since the
+    bootstrap broadcast advances it. Their ports are assigned like the ports
+    of new peers, so several runs can resume from the same checkpoint at
+    once. The addresses stored in the checkpoint are informational only.
+
+    Args:
+        ckpt (Checkpoint): the loaded checkpoint
+        max_rounds (int): the maximum rounds the simulation will run
+        server_address (tuple[str, int]): the server's address and port
+        radio_range (int): WiFi range
+        base_port (int): the port of the first peer, or None to let every peer
+        bind any free port
+        peer_kwargs: passed to every `Peer`, e.g. tracer or event_log
+
+    Returns:
+        (list[Peer]): the list of restored peers
+    """
     peers = []
-    for i in range(max_peers):
-        peer = Peer(next(random_names_generator), (i, i), 61001 + i, max_rounds, server_address, radio_range, threads)
-        peer.start()
-        # threading.Thread(target=peer.start, args=()).start()
+    for i, name in enumerate(ckpt.get_names()):
+        port: int = base_port + i if base_port else 0
+        peer = Peer(i, name, ckpt.get_pos(i), port, max_rounds, server_address, radio_range, threads, **peer_kwargs)
+        next_pos, random_directions = ckpt.get_move_state(i)
+        peer.restore_state(ckpt.round - 1, next_pos, random_directions)
         peers.append(peer)
+    start_peers(peers)
     return peers
 
 
-def start_simulation(area_size: int, max_peers: int, max_round: int, radio_range: int, num_threads: int):
+def shutdown(server: Server, peers: list[Peer], threadpool: Threadpool, outbox: Outbox = None):
+    """Stops the serving modules, the threadpool and the outbox after a failed start"""
+    server.serving_module_active = False
+    for peer in peers:
+        peer.serving_module_active = False
+    threadpool.terminate()
+    if outbox:
+        outbox.close()
+
+
+def start_simulation(
+        area_size: int,
+        max_peers: int,
+        max_round: int,
+        radio_range: int,
+        num_threads: int,
+        checkpoint_rounds: "Iterable[int]" = (),
+        checkpoint_dir: str = "checkpoints",
+        resume_from: str = None,
+        trace_path: str = None,
+        trace_neighbors: bool = False,
+        num_acceptors: int = 1,
+        backlog: int = 5,
+        profiler: Profiler = None,
+        server_port: int = 60000,
+        peer_base_port: int = None,
+        log_dir: str = None,
+        round_trace_path: str = None,
+        coalesce_window: float = None,
+        coalesce_bytes: int = 16384,
+        event_log_path: str = None,
+        timeout: float = None
+        ) -> dict:
     """Handles the simulation of a p2p network using the IPPS algorithm
     
     Args:
@@ -51,38 +130,201 @@ def start_simulation(area_size: int, max_peers: int, max_round: int, radio_range
         max_peers (int): the maximum number of peers that will appear in the simulation
         max_round (int): the maximum round the simulation will run
         radio_range (int): WiFi range
+        checkpoint_rounds (Iterable[int]): the rounds at the start of which a checkpoint is written
+        checkpoint_dir (str): the directory checkpoints are written to
+        resume_from (str): if specified, the checkpoint file the simulation resumes from
+        trace_path (str): if specified, the positions of every round are traced to this
+        file instead of being logged
+        trace_neighbors (bool): whether the neighbor counts are traced as well
+        num_acceptors (int): the number of threads accepting connections on the server
+        backlog (int): the accept queue length of the server
+        profiler (Profiler): if specified, profiles the run and writes its report at the end
+        server_port (int): the port the server listens to, or 0 to let the server
+        bind any free port
+        peer_base_port (int): the port of the first peer, the rest follow it. By
+        default every peer binds any free port and reports it in its READY message
+        log_dir (str): the directory of the `log.txt` file (default: the working directory)
+        round_trace_path (str): if specified, the phases of every peer are timestamped
+        and the critical path report of every round is written to this file
+        coalesce_window (float): if specified, outgoing messages to the same destination
+        are coalesced into single writes, and lazy ones wait up to this many seconds.
+        Otherwise every message is written at once, and only counted
+        coalesce_bytes (int): the queued bytes that flush a destination early
+        event_log_path (str): if specified, every message sent or received is recorded
+        to this structured event log, see `log_handler` for its queries
+        timeout (float): if specified, the run is stopped once it takes longer
+        than this many seconds
+
+    Raises:
+        TimeoutError: if the run did not reach max_round within timeout seconds
+
+    Returns:
+        (dict): the wall time, startup time, rounds, connection and message counters
+        of the run, and the (calls, total seconds, max seconds) of every hot path
+        timer under "timers". host_listen_overflows is the host-wide change of the ListenOverflows
+        counter during the run, not the overflows of this run alone
         
     """
+    if max_peers > area_size * area_size:
+        raise ValueError(f"{max_peers} peers do not fit in a {area_size}x{area_size} area")
+    if peer_base_port and peer_base_port + max_peers - 1 > 65535:
+        raise ValueError(
+            f"{max_peers} peers need ports {peer_base_port}-{peer_base_port + max_peers - 1}, past 65535: "
+            "lower peer_base_port"
+        )
+
+    ckpt: checkpoint.Checkpoint = None
+    if resume_from:
+        ckpt = checkpoint.load_checkpoint(resume_from)
+        if ckpt.size != area_size or ckpt.num_peers != max_peers:
+            ckpt.close()
+            raise ValueError(
+                f"Checkpoint was taken with area_size={ckpt.size} and max_peers={ckpt.num_peers}"
+            )
+        if ckpt.round >= max_round:
+            ckpt.close()
+            raise ValueError(f"Checkpoint is at round {ckpt.round}, past max_round={max_round}")
+
+    log.create_logger(log_dir or ".")
+    TIMERS.reset()
+    event_log: EventLogWriter = None
+    if event_log_path:
+        names: list[str] = ckpt.get_names() if ckpt else list(generate_names(max_peers))
+        event_log = EventLogWriter(event_log_path, names)
+    if profiler:
+        profiler.start()
+    start_time: float = time.perf_counter()
     threadpool = Threadpool(num_threads)
-    server: Server = Server(60000, area_size, max_peers, max_round, threadpool)
-    server.start()
-    peers = initialize_peers(max_peers, max_round, server.SERVER_ADDRESS, radio_range, threadpool)
-    server.bootstrap(peers)
+    tracer: RoundTracer = RoundTracer() if round_trace_path else None
+    outbox: Outbox = Outbox(coalesce_window, coalesce_bytes)
+    server: Server = Server(
+        server_port, area_size, max_peers, max_round, threadpool,
+        checkpoint_rounds, checkpoint_dir, trace_path, trace_neighbors,
+        num_acceptors, backlog,
+        profiler=profiler, tracer=tracer, outbox=outbox, event_log=event_log
+    )
+    peer_kwargs: dict = {"log_positions": trace_path is None, "tracer": tracer, "outbox": outbox, "event_log": event_log}
+    peers: list[Peer] = []
+    try:
+        server.start()
+        if ckpt:
+            server.restore_checkpoint(ckpt)
+            peers = restore_peers(ckpt, max_round, server.SERVER_ADDRESS, radio_range, threadpool, peer_base_port, **peer_kwargs)
+            random.setstate(ckpt.get_rng_state())
+            ckpt.close()
+        else:
+            peers = initialize_peers(area_size, max_peers, max_round, server.SERVER_ADDRESS, radio_range, threadpool, peer_base_port, **peer_kwargs)
+        server.bootstrap(peers)
+        startup_time: float = time.perf_counter() - start_time
+        print(f"Started {len(peers)} peers in {startup_time:.3f}s")
+    except Exception:
+        shutdown(server, peers, threadpool, outbox)
+        if event_log:
+            event_log.close()
+        raise
 
     while True:
         if server.get_round() == max_round:
-            # wait some time for the peers to process the TERM messages
-            import time
-            time.sleep(3)
+            wall_time: float = time.perf_counter() - start_time
+            # wait for the server and the peers to process the TERM messages
+            server.join()
+            for peer in peers:
+                peer.join()
+            outbox.close()
             threadpool.terminate()
+            if event_log:
+                event_log.close()
+                print(f"Event log written to {event_log.path}")
             break
+        if timeout and time.perf_counter() - start_time > timeout:
+            stuck_round: int = server.get_round()
+            shutdown(server, peers, threadpool, outbox)
+            # the serving modules close their sockets, so the ports can be reused
+            server.join()
+            for peer in peers:
+                peer.join()
+            if event_log:
+                event_log.close()
+            if profiler:
+                profiler.stop()
+            raise TimeoutError(f"The simulation was stuck at round {stuck_round} of {max_round} after {timeout}s")
+        time.sleep(0.01)
 
+    accept_stats: dict = server.get_accept_stats()
+    print(f"Accept stats: {accept_stats}")
+    if profiler:
+        profiler.stop()
+        print(f"Profile report written to {profiler.write_report()}")
+    if tracer:
+        print(f"Round trace report written to {tracer.write_report(round_trace_path)}")
+    results: dict = {
+        "wall_time": wall_time,
+        "startup_time": startup_time,
+        "rounds": server.get_round(),
+        "accepted": accept_stats["accepted"],
+        "accept_rate": accept_stats["accept_rate"],
+        # ListenOverflows is counted for the whole host, so concurrent runs
+        # (e.g. in a sweep) count the overflows of each other as well
+        "host_listen_overflows": accept_stats["host_listen_overflows"],
+    }
+    outbox_stats: dict = outbox.get_stats()
+    print(f"Outbox stats: {outbox_stats}")
+    if outbox_stats["failures"]:
+        print(f"{outbox_stats['failures']} writes failed, see the log for the lost messages")
+    results["messages"] = outbox_stats["messages"]
+    results["writes"] = outbox_stats["writes"]
+    results["write_failures"] = outbox_stats["failures"]
+    results["syscalls_per_round"] = outbox_stats["syscalls"] / max(server.get_round() - 1, 1)
+    results["messages_per_second"] = outbox_stats["messages"] / wall_time if wall_time else 0.0
+    results["timers"] = TIMERS.get_summary()
     print("End")
 
+    return results
+
+def parse_args() -> argparse.Namespace:
+    """Parses the command line arguments of a simulation run"""
+    parser = argparse.ArgumentParser(description="Simulates a p2p network using the IPPS algorithm")
+    parser.add_argument("--area-size", type=int, default=10)
+    parser.add_argument("--peers", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--radio-range", type=int, default=2)
+    parser.add_argument("--threads", type=int, help="threadpool threads (default: one per peer)")
+    parser.add_argument(
+        "--acceptors", type=int, default=1,
+        help="threads accepting connections on the server. With more than one, each gets an SO_REUSEPORT socket, "
+        "and the server refuses a port that another process already listens to"
+    )
+    parser.add_argument("--backlog", type=int, default=5, help="the accept queue length of the server")
+    parser.add_argument("--checkpoint-rounds", type=int, nargs="*", default=[])
+    parser.add_argument("--resume-from", help="a checkpoint file to resume from")
+    parser.add_argument("--trace", help="trace the positions of every round to this file")
+    parser.add_argument("--trace-neighbors", action="store_true", help="trace the neighbor counts of every round as well")
+    parser.add_argument("--round-trace", help="write the critical path of every round to this file")
+    parser.add_argument("--event-log", help="record every message to this structured event log")
+    parser.add_argument("--coalesce-window", type=float, help="coalesce outgoing messages, delaying lazy ones up to this many seconds")
+    parser.add_argument("--profile", action="store_true", help="profile the run with cProfile and tracemalloc")
+    parser.add_argument("--profile-report", default="profile_report.txt")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    AREA_SIZE = 10
-    MAX_PEERS = 10
-    MAX_ROUND = 10
-    RADIO_RANGE = 2
-    THREADPOOL_THREADS = MAX_PEERS
-    # import cProfile
-    # import pstats
-    # profiler = cProfile.Profile()
-    # profiler.enable()
-
-    start_simulation(AREA_SIZE, MAX_PEERS, MAX_ROUND, RADIO_RANGE, THREADPOOL_THREADS)
-
-    # profiler.disable()
-    # stats = pstats.Stats(profiler)
-    # stats.sort_stats("cumulative")
-    # stats.print_stats(10)
\ No newline at end of file
+    args = parse_args()
+    profiler = Profiler(args.profile_report) if args.profile else None
+
+    start_simulation(
+        args.area_size,
+        args.peers,
+        args.rounds,
+        args.radio_range,
+        args.threads or args.peers,
+        checkpoint_rounds=args.checkpoint_rounds,
+        resume_from=args.resume_from,
+        trace_path=args.trace,
+        trace_neighbors=args.trace_neighbors,
+        num_acceptors=args.acceptors,
+        backlog=args.backlog,
+        profiler=profiler,
+        round_trace_path=args.round_trace,
+        coalesce_window=args.coalesce_window,
+        event_log_path=args.event_log
+    )
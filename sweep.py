@@ -0,0 +1,157 @@
+import argparse
+import contextlib
+import csv
+import io
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from simulation import start_simulation
+
+# the default deadline of a single run, in seconds
+RUN_TIMEOUT = 600.0
+PARAMETERS = ["area_size", "max_peers", "max_round", "radio_range"]
+
+
+def build_configs(grid: dict[str, list[int]], repeats: int = 1) -> list[dict[str, int]]:
+    """Creates every combination of the parameters of a grid
+
+    Args:
+        grid (dict[str, list[int]]): the values of every parameter in `PARAMETERS`
+        repeats (int): how many times each combination is run
+
+    Returns:
+        (list[dict[str, int]]): the configurations, each with a `repeat` number
+    """
+    missing: list[str] = [parameter for parameter in PARAMETERS if not grid.get(parameter)]
+    if missing:
+        raise ValueError(f"No values for {missing}")
+    configs: list[dict[str, int]] = []
+    for values in itertools.product(*(grid[parameter] for parameter in PARAMETERS)):
+        for repeat in range(repeats):
+            config: dict[str, int] = dict(zip(PARAMETERS, values))
+            config["repeat"] = repeat
+            configs.append(config)
+    return configs
+
+
+def run_config(index: int, config: dict[str, int], out_dir: str, timeout: float = RUN_TIMEOUT) -> dict:
+    """Runs one configuration of the sweep inside a worker process
+
+    A run that takes longer than timeout is stopped and gets the status
+    "timeout", so that it does not hold its worker for the rest of the sweep.
+    The hot path timers of the run are written to `timers.json` in its directory
+
+    Args:
+        index (int): the index of the configuration in the sweep
+        config (dict[str, int]): the configuration
+        out_dir (str): the directory of the sweep
+        timeout (float): the deadline of the run, in seconds
+
+    Returns:
+        (dict): the configuration and the results of the run
+    """
+    run_dir: Path = Path(out_dir).joinpath(f"run_{index:04d}")
+    run_dir.mkdir(parents=True, exist_ok=True)
+    row: dict = {"run": index, **config, "status": "ok"}
+    output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(output):
+            results: dict = start_simulation(
+                config["area_size"],
+                config["max_peers"],
+                config["max_round"],
+                config["radio_range"],
+                config["max_peers"],
+                # the server and the peers bind free ports, so runs of this
+                # and of other sweeps never collide
+                server_port=0,
+                peer_base_port=None,
+                log_dir=str(run_dir),
+                timeout=timeout
+            )
+        run_dir.joinpath("timers.json").write_text(json.dumps(results.pop("timers"), indent=2))
+        row.update(results)
+    except TimeoutError as e:
+        row["status"] = "timeout"
+        output.write(f"{e}\n")
+    except Exception as e:
+        row["status"] = f"error: {e!r}"
+    run_dir.joinpath("stdout.txt").write_text(output.getvalue())
+    return row
+
+
+def run_sweep(configs: list[dict[str, int]], out_dir: str = "sweep", workers: int = None, timeout: float = RUN_TIMEOUT) -> list[dict]:
+    """Runs every configuration across a pool of processes
+
+    The server and the peers of every run bind free ports and every run has
+    its own log directory, so runs do not interfere with each other. The
+    host_listen_overflows column is the exception: the counter is host-wide,
+    so it includes the overflows of the runs that ran at the same time.
+
+    Args:
+        configs (list[dict[str, int]]): the configurations, see `build_configs`
+        out_dir (str): the directory the runs and `results.csv` are written to
+        workers (int): the number of worker processes (default: one per core)
+        timeout (float): the deadline of every run, in seconds
+
+    Returns:
+        (list[dict]): one row per run, in configuration order
+    """
+    workers = workers or os.cpu_count()
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    rows: list[dict] = []
+    with ProcessPoolExecutor(workers) as executor:
+        futures = [executor.submit(run_config, i, config, out_dir, timeout) for i, config in enumerate(configs)]
+        for future in as_completed(futures):
+            row: dict = future.result()
+            print(f"Run {row['run']} finished: {row['status']}")
+            rows.append(row)
+
+    rows.sort(key=lambda row: row["run"])
+    write_results(rows, Path(out_dir).joinpath("results.csv"))
+    return rows
+
+
+def write_results(rows: list[dict], path: Path):
+    """Writes the rows of a sweep into a csv table"""
+    columns: list[str] = []
+    for row in rows:
+        columns += [column for column in row if column not in columns]
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def parse_args() -> argparse.Namespace:
+    """Parses the command line arguments of a sweep"""
+    parser = argparse.ArgumentParser(description="Runs a parameter sweep of simulations across a process pool")
+    parser.add_argument("--config", help="a json file with a list of values for every parameter and, optionally, `repeats`")
+    parser.add_argument("--area-size", type=int, nargs="+")
+    parser.add_argument("--peers", type=int, nargs="+")
+    parser.add_argument("--rounds", type=int, nargs="+")
+    parser.add_argument("--radio-range", type=int, nargs="+")
+    parser.add_argument("--repeats", type=int)
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per core)")
+    parser.add_argument("--out-dir", default="sweep")
+    parser.add_argument("--timeout", type=float, default=RUN_TIMEOUT, help="the deadline of every run, in seconds")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    grid: dict = json.loads(Path(args.config).read_text()) if args.config else {}
+    # command line values override the ones of the config file
+    for parameter, values in zip(PARAMETERS, [args.area_size, args.peers, args.rounds, args.radio_range]):
+        if values:
+            grid[parameter] = values
+    repeats: int = args.repeats or grid.pop("repeats", 1)
+
+    start_time: float = time.perf_counter()
+    rows = run_sweep(build_configs(grid, repeats), args.out_dir, args.workers, args.timeout)
+    print(f"{len(rows)} runs in {time.perf_counter() - start_time:.1f}s")
+    print(f"Results written to {Path(args.out_dir).joinpath('results.csv')}")
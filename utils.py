@@ -1,3 +1,5 @@
+from pathlib import Path
+
 def string_to_tuple(s: str) -> tuple[int, int]:
     """Takes a string and turns it into a tuple
 
@@ -13,6 +15,46 @@ def string_to_tuple(s: str) -> tuple[int, int]:
 
     return t
 
+def get_initial_positions(area_size: int, max_peers: int) -> list[tuple[int, int]]:
+    """Places the peers on the diagonal of the area, or spreads them evenly over
+    the area if the diagonal is too short"""
+    if max_peers <= area_size:
+        return [(i, i) for i in range(max_peers)]
+    cells: int = area_size * area_size
+    if max_peers > cells:
+        raise ValueError(f"{max_peers} peers do not fit in a {area_size}x{area_size} area")
+    stride: int = cells // max_peers
+    return [divmod(i * stride, area_size) for i in range(max_peers)]
+
+def get_names() -> "generator":
+    """Creates a generator that yields names from `random_names.txt` file
+    
+    Yields:
+        (str): a name from the `random_names.txt` file
+    
+    """
+    filepath: Path = Path(__file__).parent.joinpath("random_names.txt")
+    with open(filepath, "r") as file:
+        names: list[str] = file.readlines()
+        for name in names:
+            name = name.strip()
+            yield name
+
+def generate_names(count: int) -> "generator":
+    """Creates a generator that yields `count` unique names
+
+    The names of `random_names.txt` are used in order, skipping repeated ones.
+    Once they run out they are reused with a suffix, e.g. the second round of
+    names yields "Olivia2"
+
+    Yields:
+        (str): a unique name
+    """
+    names: list[str] = list(dict.fromkeys(get_names()))
+    for i in range(count):
+        cycle, index = divmod(i, len(names))
+        yield names[index] if cycle == 0 else f"{names[index]}{cycle + 1}"
+
 if __name__ == "__main__":
     print(type(string_to_tuple("[1, 2]")))
     print(string_to_tuple("[1, 2]"))
\ No newline at end of file